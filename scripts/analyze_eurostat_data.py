@@ -3,132 +3,150 @@ import pandas as pd
 import numpy as np
 
 from instrat_demand_model.config import data_dir
-from instrat_demand_model.download import upload_to_gsheet
 
-
-def aggregate_carriers(df):
-    carriers = {
-        "Coal and coal products": ["Solid fossil fuels", "Manufactured gases"],
-        "Natural gas": ["Natural gas"],
-        "Oil and petroleum products": [
-            "Oil and petroleum products (excluding biofuel portion)"
-        ],
-        "Biofuels": ["Renewables and biofuels"],  # Renewables need to be subtracted
-        "Renewables": ["Solar thermal", "Geothermal", "Ambient heat (heat pumps)"],
-        "Electricity": ["Electricity"],
-        "Heat": ["Heat"],
-        "Non-renewable waste": ["Non-renewable waste"],
-    }
-
-    df_carrier = pd.DataFrame(
-        [(carrier, key) for key, values in carriers.items() for carrier in values],
-        columns=["Carrier", "Group"],
+CARRIERS = {
+    "Coal and coal products": ["Solid fossil fuels", "Manufactured gases"],
+    "Natural gas": ["Natural gas"],
+    "Oil and petroleum products": [
+        "Oil and petroleum products (excluding biofuel portion)"
+    ],
+    "Biofuels": ["Renewables and biofuels"],  # Renewables need to be subtracted
+    "Renewables": ["Solar thermal", "Geothermal", "Ambient heat (heat pumps)"],
+    "Electricity": ["Electricity"],
+    "Heat": ["Heat"],
+    "Non-renewable waste": ["Non-renewable waste"],
+}
+
+SECTORS = {
+    "Industry": [
+        "Final consumption - industry sector - energy use",
+    ],
+    "Industry - non-energy use": [
+        "Transformation input, energy sector and final consumption in industry sector - non-energy use"
+    ],
+    "Transport - road": ["Final consumption - transport sector - road - energy use"],
+    "Transport - international aviation and navigation": [
+        "International aviation",
+        "International maritime bunkers",
+    ],
+    "Transport - other": [
+        "Final consumption - transport sector - rail - energy use",
+        "Final consumption - transport sector - domestic aviation - energy use",
+        "Final consumption - transport sector - pipeline transport - energy use",
+        # "Final consumption - transport sector - non-energy use",
+    ],
+    "Buildings": [
+        "Final consumption - other sectors - households - energy use",
+        "Final consumption - other sectors - commercial and public services - energy use",
+    ],
+    "Agriculture": [
+        "Final consumption - other sectors - agriculture and forestry - energy use",
+    ],
+    # "Buildings and agriculture - non-energy use": [
+    #     "Final consumption - other sectors - non-energy use"
+    # ],
+    "Energy sector - energy use": [
+        "Energy sector - energy use",
+    ],
+    "Electricity - self-consumption": [
+        "Energy sector - electricity and heat generation - energy use"
+    ],
+    "Heat - self-consumption": [
+        "Energy sector - electricity and heat generation - energy use"
+    ],
+    "Natural gas - self-consumption": [
+        "Energy sector - oil and natural gas extraction plants - energy use"
+    ],
+    "Coal and coal products - self-consumption": [
+        "Energy sector - coal mines - energy use"
+    ],
+    "Oil and petroleum products - self-consumption": [
+        "Energy sector - oil and natural gas extraction plants - energy use",
+        "Energy sector - petroleum refineries (oil refineries) - energy use",
+    ],
+    "Losses": ["Distribution losses"],
+    "Residual": ["Statistical differences"],
+}
+
+
+def aggregation_matrix(groups, members):
+    # 0/1 matrix of shape (group, member); a member may belong to several groups
+    m = np.zeros((len(groups), len(members)))
+    for i, values in enumerate(groups.values()):
+        j = members.get_indexer(values)
+        m[i, j[j >= 0]] = 1
+    return m
+
+
+def load_energy_balances(years):
+    # Stack the yearly energy balances of all countries into one
+    # (geo, year, carrier, flow) array
+    dfs = [
+        pd.read_csv(
+            data_dir("clean", "eurostat", f"energy_balance_{year}.csv"),
+            index_col=["geo", "Carrier"],
+        )
+        for year in years
+    ]
+    geos = pd.Index(
+        pd.concat([df.index.to_frame()["geo"] for df in dfs]).unique(), name="geo"
     )
-    df = (
-        df.merge(df_carrier, on="Carrier", how="left")
-        .drop(columns=["Carrier"])
-        .rename(columns={"Group": "Carrier"})
+    carriers = pd.Index(
+        pd.concat([df.index.to_frame()["Carrier"] for df in dfs]).unique(),
+        name="Carrier",
     )
-    df = df.groupby("Carrier").sum()
+    flows = pd.Index(pd.concat([df.columns.to_series() for df in dfs]).unique())
+    index = pd.MultiIndex.from_product([geos, carriers])
+    x = np.stack(
+        [
+            df.reindex(index=index, columns=flows, fill_value=0)
+            .to_numpy()
+            .reshape(len(geos), len(carriers), len(flows))
+            for df in dfs
+        ],
+        axis=1,
+    ).astype(float)
+    return x, geos, carriers, flows
 
-    df.loc["Biofuels"] -= df.loc["Renewables"]
 
-    df = df.round(1).reset_index()
+def aggregate_carriers(x, carriers):
+    # (..., carrier, flow) -> (..., carrier group, flow)
+    groups = pd.Index(CARRIERS.keys(), name="Carrier")
+    x = np.einsum("gc,...cf->...gf", aggregation_matrix(CARRIERS, carriers), x)
 
-    df["Carrier"] = pd.Categorical(df["Carrier"], categories=carriers.keys())
-    df = df.sort_values("Carrier")
-    return df
+    x[..., groups.get_loc("Biofuels"), :] -= x[..., groups.get_loc("Renewables"), :]
 
+    return x.round(1), groups
 
-def aggregate_sectors(df):
-    sectors = {
-        "Industry": [
-            "Final consumption - industry sector - energy use",
-        ],
-        "Industry - non-energy use": [
-            "Transformation input, energy sector and final consumption in industry sector - non-energy use"
-        ],
-        "Transport - road": [
-            "Final consumption - transport sector - road - energy use"
-        ],
-        "Transport - international aviation and navigation": [
-            "International aviation",
-            "International maritime bunkers",
-        ],
-        "Transport - other": [
-            "Final consumption - transport sector - rail - energy use",
-            "Final consumption - transport sector - domestic aviation - energy use",
-            "Final consumption - transport sector - pipeline transport - energy use",
-            # "Final consumption - transport sector - non-energy use",
-        ],
-        "Buildings": [
-            "Final consumption - other sectors - households - energy use",
-            "Final consumption - other sectors - commercial and public services - energy use",
-        ],
-        "Agriculture": [
-            "Final consumption - other sectors - agriculture and forestry - energy use",
-        ],
-        # "Buildings and agriculture - non-energy use": [
-        #     "Final consumption - other sectors - non-energy use"
-        # ],
-        "Energy sector - energy use": [
-            "Energy sector - energy use",
-        ],
-        "Electricity - self-consumption": [
-            "Energy sector - electricity and heat generation - energy use"
-        ],
-        "Heat - self-consumption": [
-            "Energy sector - electricity and heat generation - energy use"
-        ],
-        "Natural gas - self-consumption": [
-            "Energy sector - oil and natural gas extraction plants - energy use"
-        ],
-        "Coal and coal products - self-consumption": [
-            "Energy sector - coal mines - energy use"
-        ],
-        "Oil and petroleum products - self-consumption": [
-            "Energy sector - oil and natural gas extraction plants - energy use",
-            "Energy sector - petroleum refineries (oil refineries) - energy use",
-        ],
-        "Losses": ["Distribution losses"],
-        "Residual": ["Statistical differences"],
-    }
 
-    df_sector = pd.DataFrame(
-        [(sector, key) for key, values in sectors.items() for sector in values],
-        columns=["Sector", "Group"],
-    )
+def redistribute(values, amount):
+    # Add amount (...,) to values (..., sector) in proportion to the shares of
+    # the sectors before redistribution, so the result does not depend on the
+    # order of sectors. Where all values are zero, nothing is redistributed.
+    total = values.sum(axis=-1, keepdims=True)
+    shares = np.divide(values, total, out=np.zeros_like(values), where=total != 0)
+    return values + amount[..., None] * shares
+
 
-    df.columns.name = "Sector"
-    df = df.set_index("Carrier").transpose().reset_index()
+def aggregate_sectors(x, flows):
+    # (..., carrier group, flow) -> (..., carrier group, sector)
     print(
         "Removed columns:",
-        set(df["Sector"].unique()) - set(df_sector["Sector"].unique()),
+        set(flows) - {flow for values in SECTORS.values() for flow in values},
     )
+    sectors = pd.Index(SECTORS.keys(), name="Sector")
+    x = np.einsum("sf,...gf->...gs", aggregation_matrix(SECTORS, flows), x).round(1)
 
-    df = (
-        df.merge(df_sector, on="Sector", how="left")
-        .drop(columns=["Sector"])
-        .rename(columns={"Group": "Sector"})
-    )
-
-    df = df[df["Sector"].notna()]
-    df = df.groupby("Sector").sum().round(1).reset_index()
-
-    df["Sector"] = pd.Categorical(df["Sector"], categories=sectors.keys())
-    df = df.sort_values("Sector")
+    carriers = pd.Index(CARRIERS.keys(), name="Carrier")
 
-    df = df.set_index("Sector").transpose().reset_index(names=["Carrier"])
+    def col(sector):
+        return sectors.get_loc(sector)
 
-    df = df.set_index("Carrier")
-
-    # Consider non-energy use for natural gas only 
-    df.loc["Natural gas", "Industry"] += df.loc[
-        "Natural gas", "Industry - non-energy use"
-    ]
-    df = df.drop(columns=["Industry - non-energy use"])
+    # Consider non-energy use for natural gas only
+    gas = carriers.get_loc("Natural gas")
+    x[..., gas, col("Industry")] += x[..., gas, col("Industry - non-energy use")]
 
-    df["Carrier production - self-consumption"] = 0
+    self_consumption = np.zeros(x.shape[:-1])
     for carrier in [
         "Coal and coal products",
         "Natural gas",
@@ -136,77 +154,90 @@ def aggregate_sectors(df):
         "Electricity",
         "Heat",
     ]:
-        df.loc[carrier, "Carrier production - self-consumption"] = df.loc[
-            carrier, f"{carrier} - self-consumption"
-        ]
-        df = df.drop(columns=[f"{carrier} - self-consumption"])
-    df["Energy sector - energy use"] -= df["Carrier production - self-consumption"] 
+        i = carriers.get_loc(carrier)
+        self_consumption[..., i] = x[..., i, col(f"{carrier} - self-consumption")]
+    x[..., col("Energy sector - energy use")] -= self_consumption
+
+    # Keep the remaining sectors in the original column order, with carrier
+    # production self-consumption appended after the residual
+    kept = [
+        sector
+        for sector in sectors
+        if sector != "Industry - non-energy use"
+        and not sector.endswith(" - self-consumption")
+    ]
+    columns = pd.Index(kept + ["Carrier production - self-consumption"], name="Sector")
+    x = np.concatenate(
+        [x[..., sectors.get_indexer(kept)], self_consumption[..., None]], axis=-1
+    )
 
     # Only for electricity include losses in demand
-    non_losses_residual = [
-        col for col in df.columns if col not in ["Losses", "Residual"]
-    ]
-    for sector in non_losses_residual:
-        df.loc["Electricity", sector] += (
-            df.loc["Electricity", "Losses"]
-            * df.loc["Electricity", sector]
-            / df.loc["Electricity", non_losses_residual].sum()
-        )
-    df = df.drop(columns=["Losses"])
+    elec = carriers.get_loc("Electricity")
+    non_losses_residual = columns.get_indexer(
+        [sector for sector in columns if sector not in ["Losses", "Residual"]]
+    )
+    x[..., elec, non_losses_residual] = redistribute(
+        x[..., elec, non_losses_residual], x[..., elec, columns.get_loc("Losses")]
+    )
+    x = np.delete(x, columns.get_loc("Losses"), axis=-1)
+    columns = columns.drop("Losses")
 
     # Distribute residuals
-    non_residual = [col for col in df.columns if col != "Residual"]
-    for sector in non_residual:
-        df[sector] += df["Residual"] * df[sector] / df[non_residual].sum(axis=1)
-    df = df.drop(columns=["Residual"])
+    non_residual = columns.get_indexer(
+        [sector for sector in columns if sector != "Residual"]
+    )
+    x[..., non_residual] = redistribute(
+        x[..., non_residual], x[..., columns.get_loc("Residual")]
+    )
+    x = np.delete(x, columns.get_loc("Residual"), axis=-1)
+    columns = columns.drop("Residual")
+
+    gross_total = x.sum(axis=-1)
+    net_total = (
+        gross_total - x[..., columns.get_loc("Carrier production - self-consumption")]
+    )
+    x = np.concatenate([x, gross_total[..., None], net_total[..., None]], axis=-1)
+    columns = columns.append(pd.Index(["Gross total", "Net total"]))
 
-    df["Gross total"] = df.sum(axis=1)
-    df["Net total"] = df["Gross total"] - df["Carrier production - self-consumption"]
+    return x.round(1), columns
 
-    df = df.round(1).reset_index()
-    return df
+
+def to_frame(x, geos, carriers, columns):
+    # (geo, carrier, column) -> one row per geo and carrier
+    index = pd.MultiIndex.from_product([geos, carriers], names=["geo", "Carrier"])
+    return pd.DataFrame(
+        x.reshape(len(index), len(columns)), index=index, columns=columns
+    ).reset_index()
 
 
 if __name__ == "__main__":
     years = [2019, 2020, 2021]
 
-    # Direct consumption
-    dfs = []
-    for year in years:
-        df = pd.read_csv(data_dir("clean", "eurostat", f"energy_balance_{year}.csv"))
-        df = aggregate_carriers(df)
-        df = aggregate_sectors(df)
+    # All countries are processed at once along the leading axis
+    x, geos, raw_carriers, flows = load_energy_balances(years)
+    x, carriers = aggregate_carriers(x, raw_carriers)
 
-        df.to_csv(
+    # Direct consumption
+    x_direct, sectors = aggregate_sectors(x, flows)
+    for i, year in enumerate(years):
+        to_frame(x_direct[:, i], geos, carriers, sectors).to_csv(
             data_dir("clean", "eurostat", f"direct_consumption_{year}.csv"),
             index=False,
         )
-        dfs.append(df)
-
-    df = pd.concat(dfs)
-    df = df.groupby("Carrier", sort=False).mean().round(1).reset_index()
-    df.to_csv(
+    to_frame(x_direct.mean(axis=1).round(1), geos, carriers, sectors).to_csv(
         data_dir("clean", "eurostat", "direct_consumption_2019-2021.csv"),
         index=False,
     )
 
     # Primary energy
-    dfs = []
-    for year in years:
-        df = pd.read_csv(data_dir("clean", "eurostat", f"energy_balance_{year}.csv"))
-        df = aggregate_carriers(df)
-        df = df.rename(columns={"Gross available energy": "Primary energy supply [PJ]"})
-        df = df[["Carrier", "Primary energy supply [PJ]"]]
-
-        df.to_csv(
+    x_primary = x[..., [flows.get_loc("Gross available energy")]]
+    columns = ["Primary energy supply [PJ]"]
+    for i, year in enumerate(years):
+        to_frame(x_primary[:, i], geos, carriers, columns).to_csv(
             data_dir("clean", "eurostat", f"primary_energy_{year}.csv"),
             index=False,
         )
-        dfs.append(df)
-
-    df = pd.concat(dfs)
-    df = df.groupby("Carrier", sort=False).mean().round(1).reset_index()
-    df.to_csv(
+    to_frame(x_primary.mean(axis=1).round(1), geos, carriers, columns).to_csv(
         data_dir("clean", "eurostat", "primary_energy_2019-2021.csv"),
         index=False,
     )
@@ -0,0 +1,79 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# Modules imported by the scripts and by pool worker processes
+MODULES = [
+    "instrat_demand_model.config",
+    "instrat_demand_model.io",
+    "instrat_demand_model.download",
+    "instrat_demand_model.download_manager",
+    "instrat_demand_model.gsheets",
+    "instrat_demand_model.codes",
+    "instrat_demand_model.eurostat",
+    "instrat_demand_model.instrat_demand_model",
+    "instrat_demand_model.parallel",
+    "instrat_demand_model.ensemble",
+    "instrat_demand_model.scenarios",
+    "instrat_demand_model.results",
+    "instrat_demand_model.store",
+    "instrat_demand_model.profiles",
+    "instrat_demand_model.pipeline",
+]
+
+# Dependencies that may only be imported on first use (pyarrow is left out as
+# pandas itself imports it when installed)
+LAZY = ["plotly", "requests", "gspread", "scipy", "openpyxl"]
+
+PROGRAM = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+t = time.perf_counter() - t
+lazy = [name for name in {lazy!r} if name in sys.modules]
+print(json.dumps({{"seconds": t, "lazy": lazy}}))
+"""
+
+
+def measure(module, repeat=5):
+    # Import module in fresh interpreters; returns the fastest import time in
+    # ms and the lazy dependencies that got imported
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", PROGRAM.format(module=module, lazy=LAZY)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        output = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(output["seconds"] * 1000)
+    return min(times), output["lazy"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="fail if importing any module takes longer",
+    )
+    args = parser.parse_args()
+
+    # Lower bound for the modules that need pandas
+    ms, _ = measure("pandas", repeat=args.repeat)
+    print(f"{'pandas (reference)':45} {ms:8.1f} ms")
+
+    failed = []
+    for module in MODULES:
+        ms, lazy = measure(module, repeat=args.repeat)
+        print(f"{module:45} {ms:8.1f} ms" + (f"  loads {lazy}" if lazy else ""))
+        if lazy or (args.max_ms is not None and ms > args.max_ms):
+            failed.append(module)
+
+    if failed:
+        print(f"Import time regressions: {failed}")
+        sys.exit(1)
@@ -11,9 +11,8 @@ def add_energy_sector_to_industry(df):
     df.drop(columns=["Energy sector - energy use"], inplace=True)
 
 
-def add_hydrogen_demand(df):
-    hydrogen_consumption_in_tonnes = 1.04e6
-    # https://www.gov.pl/attachment/1b590d54-fa1e-49fe-9096-b2d0c6a4fe59
+def add_hydrogen_demand(df, hydrogen_consumption_in_tonnes):
+    # PL: https://www.gov.pl/attachment/1b590d54-fa1e-49fe-9096-b2d0c6a4fe59
     # assumed 80% capacity utilization
 
     mj_per_kg = 120
@@ -23,7 +22,7 @@ def add_hydrogen_demand(df):
 
     natural_gas_reforming_efficiency = 0.7
     # NETL 2023 https://doi.org/10.2172/1862910
-    # assumed all hydrogen in Poland is produced through steam methane reforming
+    # assumed all hydrogen is produced through steam methane reforming
 
     natural_gas_consumption_in_pj = (
         hydrogen_consumption_in_pj / natural_gas_reforming_efficiency
@@ -79,14 +78,19 @@ def add_decentralized_heat_demand(df):
     df.loc["Electricity", "Buildings"] -= df_heat.loc["Renewables", "Heat"] / scop
 
 
-def add_light_vehicle_energy_demand(df):
+def add_light_vehicle_energy_demand(
+    df,
+    light_vehicle_oil_consumption_as_fraction_of_road,
+    light_vehicle_kilometers,
+    number_of_light_vehicles,
+):
     road_transport_oil_consumption = df.loc[
         "Oil and petroleum products", "Transport - road"
     ]
     # PJ
 
-    light_vehicle_oil_consumption_as_fraction_of_road = 0.63
-    # KOBIZE National Inventory Report 2023
+    # light_vehicle_oil_consumption_as_fraction_of_road
+    # PL: KOBIZE National Inventory Report 2023
     # https://cdr.eionet.europa.eu/pl/eu/mmr/art07_inventory/ghg_inventory/envzckvq/NIR_2023_POL.pdf
     # fuels: gasoline, diesel, and LPG consumption
     # road: passenger cars, light duty trucks, heavy duty trucks and buses, motorcycles and mopeds
@@ -106,15 +110,15 @@ def add_light_vehicle_energy_demand(df):
         tank_to_wheel_efficiency * light_vehicle_oil_consumption
     )
 
-    light_vehicle_kilometers = 214e9
-    # https://stat.gov.pl/obszary-tematyczne/transport-i-lacznosc/transport/transport-drogowy-w-polsce-w-latach-2020-i-2021GUS,6,7.html
+    # light_vehicle_kilometers
+    # PL: https://stat.gov.pl/obszary-tematyczne/transport-i-lacznosc/transport/transport-drogowy-w-polsce-w-latach-2020-i-2021GUS,6,7.html
 
     wheel_mj_per_vkm = (
         light_vehicle_wheel_energy_consumption / light_vehicle_kilometers * 1e9
     )
 
-    number_of_light_vehicles = 1.1 * 20e6
-    # SAMAR https://www.samar.pl/__/3/3.a/117083/3.sc/11/Park-2022---Ile-jest-w-Polsce-samochod%C3%B3w-i-jaki-jest-ich-wiek-.html
+    # number_of_light_vehicles
+    # PL: SAMAR https://www.samar.pl/__/3/3.a/117083/3.sc/11/Park-2022---Ile-jest-w-Polsce-samochod%C3%B3w-i-jaki-jest-ich-wiek-.html
     # multiply by 1.1 to account for light duty vehicles
     km_per_vehicle = light_vehicle_kilometers / number_of_light_vehicles
 
@@ -130,19 +134,21 @@ def add_light_vehicle_energy_demand(df):
     ] = light_vehicle_wheel_energy_consumption
 
 
-if __name__ == "__main__":
-    df = pd.read_csv(
-        data_dir("clean", "eurostat", "direct_consumption_2019-2021.csv"),
-    )
-    df = df.set_index("Carrier")
-
+def create_baseline_demand(df, coefficients):
+    # df: direct consumption of one country indexed by carrier
+    # coefficients: row of the country coefficients table
     df = df.drop(columns=["Gross total", "Net total"], index=["Non-renewable waste"])
     df = df.rename(index={"Heat": "Heat - centralized"})
 
     add_energy_sector_to_industry(df)
-    add_hydrogen_demand(df)
+    add_hydrogen_demand(df, coefficients["hydrogen_consumption_in_tonnes"])
     add_decentralized_heat_demand(df)
-    add_light_vehicle_energy_demand(df)
+    add_light_vehicle_energy_demand(
+        df,
+        coefficients["light_vehicle_oil_consumption_as_fraction_of_road"],
+        coefficients["light_vehicle_kilometers"],
+        coefficients["number_of_light_vehicles"],
+    )
 
     transport_columns = [
         "Transport - road",
@@ -173,7 +179,31 @@ if __name__ == "__main__":
         "Light vehicle energy",
     ]
 
-    df = df.loc[carriers, sectors].reset_index()
+    return df.loc[carriers, sectors]
+
+
+if __name__ == "__main__":
+    df = pd.read_csv(
+        data_dir("clean", "eurostat", "direct_consumption_2019-2021.csv"),
+    )
+    df = df.set_index(["geo", "Carrier"])
+
+    # Country specific coefficients, one row per geo
+    df_coefficients = pd.read_csv(
+        data_dir("raw", "country_coefficients.csv"), index_col="geo"
+    )
+    geos = df.index.unique("geo")
+    missing = geos.difference(df_coefficients.index)
+    if len(missing) > 0:
+        raise ValueError(f"No country coefficients for: {list(missing)}")
+
+    dfs = []
+    for geo in geos:
+        print(f"\n{geo}")
+        dfs.append(
+            create_baseline_demand(df.loc[geo].copy(), df_coefficients.loc[geo])
+        )
+    df = pd.concat(dfs, keys=geos, names=["geo", "Carrier"]).reset_index()
 
     df.to_csv(
         data_dir("clean", "baseline_demand_2019-2021.csv"),
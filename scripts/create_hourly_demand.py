@@ -0,0 +1,37 @@
+import argparse
+import time
+
+from instrat_demand_model.config import data_dir
+from instrat_demand_model.profiles import (
+    create_hourly_demand,
+    read_profiles,
+    synthetic_profiles,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--profiles",
+        default=None,
+        help="CSV of hourly profiles (default: data/raw/profiles/hourly_profiles.csv"
+        " if it exists, otherwise synthetic profiles)",
+    )
+    parser.add_argument("--geo", nargs="+", default=None)
+    parser.add_argument("--scenario", nargs="+", default=None)
+    args = parser.parse_args()
+
+    profiles_file = args.profiles
+    if (
+        profiles_file is None
+        and data_dir("raw", "profiles", "hourly_profiles.csv").exists()
+    ):
+        profiles_file = data_dir("raw", "profiles", "hourly_profiles.csv")
+    if profiles_file is None:
+        print("Using synthetic hourly profiles")
+        profiles = synthetic_profiles()
+    else:
+        profiles = read_profiles(profiles_file)
+
+    start = time.perf_counter()
+    files = create_hourly_demand(profiles, geo=args.geo, scenario=args.scenario)
+    print(f"Wrote {len(files)} files in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,28 @@
+import argparse
+
+from instrat_demand_model.download_manager import download_all, read_manifest
+
+if __name__ == "__main__":
+    # Refresh all raw inputs listed in data/raw/manifest.csv in one parallel
+    # pass; unchanged files are only revalidated
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument(
+        "--max-per-host",
+        type=int,
+        default=4,
+        help="concurrent requests to the same host",
+    )
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument(
+        "--force", action="store_true", help="download even if unchanged"
+    )
+    args = parser.parse_args()
+
+    download_all(
+        read_manifest(),
+        max_workers=args.max_workers,
+        max_per_host=args.max_per_host,
+        retries=args.retries,
+        force=args.force,
+    )
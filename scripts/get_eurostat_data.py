@@ -1,34 +1,38 @@
+import argparse
 import os
-import pandas as pd
-import numpy as np
 
+from instrat_demand_model.codes import code_list
 from instrat_demand_model.config import data_dir
 from instrat_demand_model.download import download_and_unzip
+from instrat_demand_model.eurostat import EU27, ingest_nrg_bal, read_nrg_bal
 
 if __name__ == "__main__":
     # Before running the script download the following custom dataset from Eurostat as csv
     # https://ec.europa.eu/eurostat/databrowser/bookmark/cf9e32ad-dd93-4c84-95d3-79288194718a
+    # or pass the full nrg_bal_c bulk file (SDMX-CSV, possibly gzipped) as --raw-file
     filename_eurostat = "nrg_bal_c__custom_7064775_linear.csv"
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--raw-file", default=str(data_dir("raw", "eurostat", filename_eurostat))
+    )
+    parser.add_argument(
+        "--geo", nargs="+", default=["PL"], help="country codes, or EU27 for all"
+    )
+    parser.add_argument("--years", type=int, nargs="+", default=[2019, 2020, 2021])
+    parser.add_argument(
+        "--force", action="store_true", help="ingest the raw file even if cached"
+    )
+    args = parser.parse_args()
+    geos = EU27 if args.geo == ["EU27"] else args.geo
+
     os.makedirs(data_dir("raw", "eurostat"), exist_ok=True)
     os.makedirs(data_dir("clean", "eurostat"), exist_ok=True)
 
-    dfs_codes = {}
-    for variable_short, variable_long, name in [
-        ("siec", "Carrier", "ESTAT_SIEC_en"),
-        ("nrg_bal", "Variable", "ESTAT_NRG_BAL_en"),
-    ]:
-        dfs_codes[variable_short] = pd.read_csv(
-            data_dir("raw", "eurostat", f"{name}.tsv"),
-            sep="\t",
-            header=None,
-            names=[variable_short, variable_long],
-        )
+    siec = code_list("siec")
+    nrg_bal = code_list("nrg_bal")
 
     # Energy balance
-    raw_file = data_dir("raw", "eurostat", filename_eurostat)
-    df = pd.read_csv(raw_file)
-
     columns_balance = [
         "GAE",  # Gross available energy
         "INTMARB",  # International maritime bunkers
@@ -69,19 +73,30 @@ if __name__ == "__main__":
         "STATDIFF",
     ]
 
-    df = pd.merge(df, dfs_codes["siec"], on="siec", how="left")
+    # Only the filtered rows of the raw file are kept in memory and cached
+    cache_file = data_dir("cache", "eurostat", "nrg_bal_c.parquet")
+    ingest_nrg_bal(
+        args.raw_file,
+        cache_file,
+        geo=geos,
+        years=args.years,
+        nrg_bal=columns_balance + columns_consumption,
+        unit="TJ",
+        force=args.force,
+    )
+    df = read_nrg_bal(cache_file)
+
+    df["Carrier"] = siec.to_labels(df["siec"]).astype(object)
     df = df.rename(columns={"TIME_PERIOD": "Year"})
 
     df["Value [PJ]"] = (df["OBS_VALUE"].astype(float) / 1000).round(1)
     df = df[df["Value [PJ]"] > 0]
 
     df = df.pivot(
-        index=["Year", "Carrier"], columns="nrg_bal", values="Value [PJ]"
+        index=["geo", "Year", "Carrier"], columns="nrg_bal", values="Value [PJ]"
     ).fillna(0)
 
-    df = df[columns_balance + columns_consumption].rename(
-        columns=dfs_codes["nrg_bal"].set_index("nrg_bal")["Variable"]
-    )
+    df = df[columns_balance + columns_consumption].rename(columns=nrg_bal.to_dict())
     df = df.reset_index()
 
     df["Residual balance"] = (
@@ -0,0 +1,156 @@
+import argparse
+
+import pandas as pd
+
+from instrat_demand_model.config import data_dir, project_dir
+from instrat_demand_model.eurostat import EU27
+from instrat_demand_model.pipeline import Stage, run_pipeline
+
+
+def package_dir(*path):
+    return project_dir("src", "instrat_demand_model", *path)
+
+
+# Every stage depends on the whole package, as the modules its script imports
+# import further modules of the package
+package_code = sorted(package_dir().glob("*.py"))
+
+
+years = [2019, 2020, 2021]
+scenarios = ["instrat_ambitious", "baseline", "slow_transformation"]
+sectors = ["Industry", "Buildings", "Transport", "Agriculture"]
+
+
+def default_geos():
+    # Every country in the baseline demand, or before it is created, every
+    # country with coefficients for it
+    file = data_dir("clean", "baseline_demand_2019-2021.csv")
+    if not file.exists():
+        file = data_dir("raw", "country_coefficients.csv")
+    return list(
+        pd.read_csv(file, usecols=["geo"], keep_default_na=False)["geo"].unique()
+    )
+
+
+def create_stages(geos):
+    return [
+        Stage(
+            name="get_eurostat_data",
+            script=project_dir("scripts", "get_eurostat_data.py"),
+            inputs=[
+                data_dir("raw", "eurostat", "nrg_bal_c__custom_7064775_linear.csv"),
+                data_dir("raw", "eurostat", "ESTAT_SIEC_en.tsv"),
+                data_dir("raw", "eurostat", "ESTAT_NRG_BAL_en.tsv"),
+            ],
+            outputs=[
+                data_dir("clean", "eurostat", f"energy_balance_{year}.csv")
+                for year in years
+            ],
+            code=package_code,
+            args=["--geo"] + list(geos),
+        ),
+        Stage(
+            name="analyze_eurostat_data",
+            script=project_dir("scripts", "analyze_eurostat_data.py"),
+            inputs=[
+                data_dir("clean", "eurostat", f"energy_balance_{year}.csv")
+                for year in years
+            ],
+            outputs=[
+                data_dir("clean", "eurostat", f"{name}_{suffix}.csv")
+                for name in ["direct_consumption", "primary_energy"]
+                for suffix in years + ["2019-2021"]
+            ],
+            code=package_code,
+        ),
+        Stage(
+            name="create_baseline_demand",
+            script=project_dir("scripts", "create_baseline_demand.py"),
+            inputs=[
+                data_dir("clean", "eurostat", "direct_consumption_2019-2021.csv"),
+                data_dir("raw", "country_coefficients.csv"),
+            ],
+            outputs=[data_dir("clean", "baseline_demand_2019-2021.csv")],
+            code=package_code,
+        ),
+        Stage(
+            name="create_demand_timeseries",
+            script=project_dir("scripts", "create_demand_timeseries.py"),
+            inputs=[
+                data_dir("clean", "baseline_demand_2019-2021.csv"),
+                data_dir("raw", "scenarios", "rates.csv"),
+                data_dir("raw", "scenarios", "sector_parameters.csv"),
+            ],
+            outputs=[data_dir("clean", "demand_timeseries")]
+            + [
+                data_dir(
+                    "clean",
+                    f"demand_timeseries;geo={geo};scenario={scenario};{key}.csv",
+                )
+                for geo in geos
+                for scenario in scenarios
+                for key in [f"sector={sector}" for sector in sectors]
+                + ["unit=PJ", "unit=TWh"]
+            ],
+            code=package_code,
+            args=["--geo"] + list(geos),
+        ),
+        Stage(
+            name="visualize_demand_timeseries",
+            script=project_dir("scripts", "visualize_demand_timeseries.py"),
+            inputs=[data_dir("clean", "demand_timeseries")],
+            outputs=[
+                project_dir("figures", f"demand_timeseries;carrier={carrier}.png")
+                for carrier in [
+                    "Electricity",
+                    "Heat",
+                    "Hydrogen",
+                    "Light vehicle energy",
+                ]
+            ],
+            code=package_code,
+        ),
+        Stage(
+            name="create_hourly_demand",
+            script=project_dir("scripts", "create_hourly_demand.py"),
+            inputs=[data_dir("clean", "demand_timeseries")],
+            outputs=[
+                data_dir(
+                    "clean",
+                    "hourly_demand",
+                    f"geo={geo}",
+                    f"scenario={scenario}",
+                    "part-0.parquet",
+                )
+                for geo in geos
+                for scenario in scenarios
+            ],
+            code=package_code,
+            args=["--geo"] + list(geos),
+        ),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=None,
+        help="number of stages run concurrently",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="rerun all stages regardless of changes"
+    )
+    parser.add_argument(
+        "--geo",
+        nargs="+",
+        default=None,
+        help="country codes, or EU27 (default: all countries in the baseline demand)",
+    )
+    args = parser.parse_args()
+    geos = args.geo if args.geo is not None else default_geos()
+    if geos == ["EU27"]:
+        geos = EU27
+
+    run_pipeline(create_stages(geos), max_workers=args.max_workers, force=args.force)
@@ -1,9 +1,8 @@
 import pandas as pd
 
 
-from instrat_demand_model.config import data_dir
-from instrat_demand_model.download import upload_to_gsheet
-
+from instrat_demand_model.gsheets import sync_gsheets
+from instrat_demand_model.store import PARTITION_KEYS, read_demand_dataset
 
 if __name__ == "__main__":
     scenario_urls = {
@@ -12,14 +11,17 @@ if __name__ == "__main__":
         "slow_transformation": "https://docs.google.com/spreadsheets/d/1AelU6KUr0qXWQa7-foduvTgbkgY_pfShJTYd74K6iPA",
     }
 
+    sectors = ["Buildings", "Industry", "Transport", "Agriculture"]
+
+    uploads = []
     for scenario, url in scenario_urls.items():
+        df_scenario = read_demand_dataset(
+            geo="PL", scenario=scenario, sector=sectors, unit="PJ"
+        )
         dfs = []
-        for sector in ["Buildings", "Industry", "Transport", "Agriculture"]:
-            df = pd.read_csv(
-                data_dir(
-                    "clean",
-                    f"demand_timeseries;scenario={scenario};sector={sector}.csv",
-                )
+        for sector in sectors:
+            df = df_scenario[df_scenario["sector"] == sector].drop(
+                columns=PARTITION_KEYS
             )
             df["Sector"] = sector
             df["Carrier"] = (
@@ -32,4 +34,8 @@ if __name__ == "__main__":
             dfs.append(df)
         df = pd.concat(dfs)
 
-        upload_to_gsheet(df, url, sheet_name="# Demand per sector and carrier")
+        uploads.append((df, url, "# Demand per sector and carrier"))
+
+    # All scenarios are synced concurrently with one client, writing only the
+    # changed cells
+    sync_gsheets(uploads)
@@ -1,19 +1,19 @@
-import pandas as pd
 import plotly.express as px
 
 
-from instrat_demand_model.config import data_dir, project_dir
+from instrat_demand_model.config import project_dir
+from instrat_demand_model.store import TOTAL, read_demand_dataset
 
 if __name__ == "__main__":
-    dfs = []
-    for scenario in ["instrat_ambitious", "baseline", "slow_transformation"]:
-        df = pd.read_csv(
-            data_dir("clean", f"demand_timeseries;scenario={scenario};unit=TWh.csv")
-        )
-        df["Scenario"] = scenario
-        dfs.append(df)
-
-    df = pd.concat(dfs)
+    df = read_demand_dataset(
+        geo="PL",
+        scenario=["instrat_ambitious", "baseline", "slow_transformation"],
+        sector=TOTAL,
+        unit="TWh",
+    )
+    df = df.drop(columns=["geo", "sector", "unit"]).rename(
+        columns={"scenario": "Scenario"}
+    )
 
     df["Carrier"] = df["Carrier"].apply(
         lambda x: x if not x.startswith("Heat") else "Heat"
@@ -0,0 +1,111 @@
+from dataclasses import asdict, is_dataclass
+from functools import lru_cache
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Modules whose code determines the output of create_sectoral_demand_timeseries
+MODEL_MODULES = ["instrat_demand_model.py", "conversion.py"]
+
+
+@lru_cache(maxsize=None)
+def model_fingerprint():
+    h = hashlib.sha256()
+    for module in MODEL_MODULES:
+        h.update(Path(__file__).with_name(module).read_bytes())
+    return h.hexdigest()
+
+
+def _normalize(value):
+    # JSON-ready copy of the parameters with every number as a float64, so that
+    # equal inputs of different numeric types (1 and 1.0, numpy int and float
+    # scalars, dicts and Series of rates) give the same key
+    if is_dataclass(value):
+        value = asdict(value)
+    if isinstance(value, pd.Series):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        return {_normalize_key(key): _normalize(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(val) for val in value]
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float64).tolist()
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    if value is None or isinstance(value, str):
+        return value
+    raise TypeError(f"Cannot hash value of type {type(value)}")
+
+
+def _normalize_key(key):
+    # Years may be given as Python or numpy integers
+    if isinstance(key, np.generic):
+        key = key.item()
+    return str(key)
+
+
+def sector_parameters(sector, params):
+    # Slices of the scenario parameters that a sector actually reads; options
+    # such as the interpolation apply to all sectors, and sectors without
+    # additional pathways have none
+    def select(name, value):
+        if isinstance(value, str):
+            return value
+        if name == "pathways":
+            return value.get(sector, [])
+        return value[sector]
+
+    return {
+        name: select(name, value) for name, value in params.items() if value is not None
+    }
+
+
+def cell_key(sector, df_baseline, params, initial_year=2020, final_year=2050):
+    baseline = df_baseline[sector]
+    h = hashlib.sha256()
+    h.update(model_fingerprint().encode())
+    h.update(
+        json.dumps(
+            {
+                "sector": sector,
+                "carriers": [str(carrier) for carrier in baseline.index],
+                "parameters": _normalize(sector_parameters(sector, params)),
+                "years": [int(initial_year), int(final_year)],
+            },
+            sort_keys=True,
+        ).encode()
+    )
+    h.update(baseline.to_numpy(dtype=float).tobytes())
+    return h.hexdigest()
+
+
+class SectorCache:
+    # Sector demand timeseries keyed by cell_key, kept in memory and, if
+    # cachedir is given, persisted as one pickle per key
+    def __init__(self, cachedir=None):
+        self.cachedir = Path(cachedir) if cachedir is not None else None
+        self.frames = {}
+
+    def _file(self, key):
+        return self.cachedir.joinpath(f"{key}.pkl")
+
+    def get(self, key):
+        if key not in self.frames:
+            if self.cachedir is None or not self._file(key).exists():
+                return None
+            self.frames[key] = pd.read_pickle(self._file(key))
+        return self.frames[key].copy()
+
+    def put(self, key, df):
+        self.frames[key] = df
+        if self.cachedir is not None:
+            os.makedirs(self.cachedir, exist_ok=True)
+            tmp_file = self._file(key).with_suffix(".tmp")
+            df.to_pickle(tmp_file)
+            os.replace(tmp_file, self._file(key))
@@ -0,0 +1,86 @@
+from functools import lru_cache
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrat_demand_model.config import data_dir
+
+# Eurostat code dictionaries downloaded by get_eurostat_data.py
+CODE_LISTS = {
+    "siec": "ESTAT_SIEC_en",
+    "nrg_bal": "ESTAT_NRG_BAL_en",
+}
+
+
+class CodeList:
+    # Bidirectional mapping between Eurostat codes and their labels. Labels
+    # need not be unique; label -> code then returns the first code listed.
+    def __init__(self, codes, labels):
+        self.codes = np.asarray(codes, dtype=str)
+        self.labels = np.asarray(labels, dtype=str)
+        self.index = pd.Index(self.codes)
+        self._labels = dict(zip(self.codes, self.labels))
+        self._codes = dict(zip(self.labels[::-1], self.codes[::-1]))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self._labels
+
+    def label(self, code):
+        return self._labels[code]
+
+    def code(self, label):
+        return self._codes[label]
+
+    def to_labels(self, values):
+        # Vectorized code -> label mapping, with NaN for unknown codes.
+        # Categorical input is mapped once per category and stays categorical.
+        if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+            values = pd.Series(values)
+            labels = pd.Series(self.to_labels(values.cat.categories.to_numpy()))
+            if labels.notna().all() and labels.is_unique:
+                return values.cat.rename_categories(labels.to_numpy())
+            return values.cat.codes.map(labels).astype(object)
+
+        positions = self.index.get_indexer(np.asarray(values, dtype=object))
+        labels = self.labels.astype(object).take(positions)
+        labels[positions < 0] = np.nan
+        if isinstance(values, pd.Series):
+            return pd.Series(labels, index=values.index, name=values.name)
+        return labels
+
+    def to_dict(self):
+        return dict(self._labels)
+
+
+def _read_tsv(file):
+    df = pd.read_csv(
+        file, sep="\t", header=None, names=["code", "label"], keep_default_na=False
+    )
+    return df["code"].to_numpy(dtype=str), df["label"].to_numpy(dtype=str)
+
+
+@lru_cache(maxsize=None)
+def code_list(name, cachedir=None):
+    # Parse the TSV dictionary once per process; the parsed arrays are also
+    # kept as .npz in cachedir, keyed by the hash of the TSV file
+    file = data_dir("raw", "eurostat", f"{CODE_LISTS[name]}.tsv")
+    if cachedir is None:
+        cachedir = data_dir("cache", "eurostat")
+
+    digest = hashlib.sha256(file.read_bytes()).hexdigest()[:16]
+    cache_file = cachedir.joinpath(f"{CODE_LISTS[name]}-{digest}.npz")
+    if cache_file.exists():
+        with np.load(cache_file, allow_pickle=False) as arrays:
+            return CodeList(arrays["codes"], arrays["labels"])
+
+    codes, labels = _read_tsv(file)
+    os.makedirs(cachedir, exist_ok=True)
+    tmp_file = cache_file.with_suffix(".tmp.npz")
+    np.savez(tmp_file, codes=codes, labels=labels)
+    os.replace(tmp_file, cache_file)
+    return CodeList(codes, labels)
@@ -1,15 +1,11 @@
 from pathlib import Path
-import inspect
-import logging
-import plotly.graph_objs as go
-import locale
+
+# Repository root, resolved once from the location of this file
+ROOT = Path(__file__).resolve().parents[2]
 
 
 def project_dir(*path):
-    root = (
-        Path(inspect.getframeinfo(inspect.currentframe()).filename).resolve().parents[2]
-    )
-    return Path(root, *path)
+    return Path(ROOT, *path)
 
 
 def data_dir(*path):
@@ -31,6 +27,8 @@ def local_sort(val):
 """
 
 def make_instrat_template():
+    import plotly.graph_objs as go
+
     template = go.layout.Template()
     template.layout.title.font = dict(
         family="Work Sans Medium, sans-serif", size=18, color="black"
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class ConversionOperator:
+    # Conversion matrix stored as its diagonal plus the off-diagonal transfer
+    # entries (rows, cols). Diagonal and values may carry leading batch axes
+    # (e.g. period, sample, sector) that broadcast against the state in apply.
+    size: int
+    diagonal: np.ndarray
+    rows: np.ndarray
+    cols: np.ndarray
+    values: np.ndarray
+
+    def __post_init__(self):
+        # Keep transfers grouped by target row, so that they can be summed
+        # with a single reduceat
+        order = np.argsort(self.rows, kind="stable")
+        self.rows = np.asarray(self.rows, dtype=int)[order]
+        self.cols = np.asarray(self.cols, dtype=int)[order]
+        self.values = np.asarray(self.values, dtype=float)[..., order]
+        self.target_rows, self.row_starts = np.unique(self.rows, return_index=True)
+
+    @property
+    def nnz(self):
+        return self.size + len(self.rows)
+
+    def __getitem__(self, key):
+        return ConversionOperator(
+            size=self.size,
+            diagonal=self.diagonal[key],
+            rows=self.rows,
+            cols=self.cols,
+            values=self.values[key],
+        )
+
+    def apply(self, x):
+        y = self.diagonal * x
+        if len(self.rows) > 0:
+            transfers = self.values * x[..., self.cols]
+            y[..., self.target_rows] += np.add.reduceat(
+                transfers, self.row_starts, axis=-1
+            )
+        return y
+
+    def to_dense(self):
+        batch_shape = np.broadcast_shapes(
+            self.diagonal.shape[:-1], self.values.shape[:-1]
+        )
+        m = np.zeros(batch_shape + (self.size, self.size))
+        diag = np.arange(self.size)
+        m[..., diag, diag] = self.diagonal
+        np.add.at(m, (..., self.rows, self.cols), self.values)
+        return m
+
+    def to_scipy(self):
+        import scipy.sparse
+
+        if self.diagonal.ndim != 1 or self.values.ndim != 1:
+            raise ValueError("Only operators without batch axes can be exported")
+        diag = np.arange(self.size)
+        return scipy.sparse.csr_array(
+            (
+                np.concatenate([self.diagonal, self.values]),
+                (
+                    np.concatenate([diag, self.rows]),
+                    np.concatenate([diag, self.cols]),
+                ),
+            ),
+            shape=(self.size, self.size),
+        )
+
+
+@dataclass
+class Pathway:
+    # Every year the rate share of the source demand is converted, and the
+    # efficiency fraction of it ends up in the target carrier. The source must
+    # be a model carrier: fossil fuels only exist as their " - electrifiable"
+    # and " - hydrogenizable" pools after initialize, so e.g. "Natural gas -
+    # electrifiable" is a valid source and "Natural gas" is not.
+    source: str
+    target: str
+    rates: dict
+    efficiency: float
+
+
+def edge_operator(size, sources, targets, rates, efficiency):
+    # Compile a conversion graph given as index arrays of its edges; rates
+    # has shape (..., n_edges) and efficiency broadcasts against it
+    sources = np.asarray(sources, dtype=int)
+    rates = np.asarray(rates, dtype=float)
+    diagonal = np.ones(rates.shape[:-1] + (size,))
+    if len(np.unique(sources)) == len(sources):
+        diagonal[..., sources] -= rates
+    else:
+        np.subtract.at(diagonal, (..., sources), rates)
+
+    return ConversionOperator(
+        size=size,
+        diagonal=diagonal,
+        rows=targets,
+        cols=sources,
+        values=efficiency * rates,
+    )
+
+
+def substitution_operator(carriers, pathways, batch_shape=()):
+    # pathways: list of (sources, target, rates, conv) with source and target
+    # carrier positions, and rates and conv broadcastable to batch_shape
+    sources = [np.empty(0, dtype=int)]
+    targets = [np.empty(0, dtype=int)]
+    rates = [np.empty(batch_shape + (0,))]
+    efficiency = [np.empty(batch_shape + (0,))]
+    for s, t, r, c in pathways:
+        shape = batch_shape + (len(s),)
+        sources.append(np.asarray(s, dtype=int))
+        targets.append(np.full(len(s), t))
+        rates.append(np.broadcast_to(np.asarray(r)[..., None], shape))
+        efficiency.append(np.broadcast_to(np.asarray(c)[..., None], shape))
+
+    return edge_operator(
+        len(carriers),
+        np.concatenate(sources),
+        np.concatenate(targets),
+        np.concatenate(rates, axis=-1),
+        np.concatenate(efficiency, axis=-1),
+    )
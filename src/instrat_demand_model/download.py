@@ -1,46 +1,187 @@
-from io import BytesIO
+from email.utils import formatdate
+import hashlib
+import json
 import os
-import requests
-from zipfile import ZipFile
-import gspread
+from pathlib import Path
+import threading
+
 import pandas as pd
 
+from instrat_demand_model.config import data_dir
+from instrat_demand_model.gsheets import fetch_worksheets, sync_gsheets
 
-def download(url, savedir, filename, params=None, force=False):
-    file = savedir.joinpath(filename)
-    if not force and file.exists():
-        return
+# requests, zipfile and gspread are imported where they are used, so that
+# importing this module does not load the HTTP and Google API stacks
+
+# The .part file is flushed after every chunk, so an interrupted download
+# loses at most one chunk. Smaller chunks waste less on interruption but cost
+# more write calls; the file is not fsynced, as that only guards against a
+# crash of the whole machine and the data can always be fetched again.
+CHUNK_SIZE = 1 << 16
+
+# Validators (ETag, Last-Modified) of downloaded files, keyed by file path
+_metadata_lock = threading.Lock()
+
+
+def metadata_file():
+    return data_dir("cache", "downloads.json")
+
+
+def _load_metadata():
+    if not metadata_file().exists():
+        return {}
+    with open(metadata_file()) as f:
+        return json.load(f)
+
+
+def _update_metadata(key, entry):
+    # Read-modify-write under a lock, as downloads may run in threads
+    with _metadata_lock:
+        metadata = _load_metadata()
+        if entry is None:
+            metadata.pop(key, None)
+        else:
+            metadata[key] = entry
+        os.makedirs(metadata_file().parent, exist_ok=True)
+        tmp_file = metadata_file().with_suffix(".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(metadata, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, metadata_file())
+
+
+def _validators(response):
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def download(
+    url,
+    savedir,
+    filename,
+    params=None,
+    force=False,
+    session=None,
+    progress=None,
+    timeout=None,
+):
+    # Stream url to savedir/filename through a .part file that is renamed when
+    # complete. An existing file is revalidated with a conditional request and
+    # only fetched again if it changed on the server; an interrupted download
+    # is resumed with a Range request if the server still has the same version.
+    # Returns True if the file was (re)downloaded, False if it was up to date.
+    if session is None:
+        import requests
+
+        session = requests
+
+    file = Path(savedir).joinpath(filename)
+    part_file = file.with_name(file.name + ".part")
+    key = str(file.resolve())
+    metadata = _load_metadata()
     os.makedirs(savedir, exist_ok=True)
-    print(f"Downloading from {url}")
-    r = requests.get(url, params=params, stream=True)
-    with open(file, "wb") as f:
-        f.write(r.content)
 
+    headers = {}
+    if file.exists() and not force:
+        entry = metadata.get(key, {})
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        headers["If-Modified-Since"] = entry.get("last_modified") or formatdate(
+            file.stat().st_mtime, usegmt=True
+        )
 
-def download_and_unzip(url, savedir, filename="", rename=False, force=False):
-    file = savedir.joinpath(filename)
-    if not force and file.exists():
-        return
+    partial = metadata.get(key + ".part", {})
+    offset = part_file.stat().st_size if part_file.exists() else 0
+    validator = partial.get("etag") or partial.get("last_modified")
+    if offset > 0 and validator and not force:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+
+    with session.get(
+        url, params=params, headers=headers, stream=True, timeout=timeout
+    ) as r:
+        if r.status_code == 304:
+            return False
+        if r.status_code == 416:
+            # The part file does not match the resource any more
+            os.remove(part_file)
+            _update_metadata(key + ".part", None)
+            return download(
+                url, savedir, filename, params, force, session, progress, timeout
+            )
+        r.raise_for_status()
+
+        if r.status_code == 206:
+            print(f"Resuming download from {url} at byte {offset}")
+            mode = "ab"
+        else:
+            print(f"Downloading from {url}")
+            mode = "wb"
+        _update_metadata(key + ".part", _validators(r))
+
+        with open(part_file, mode) as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                f.flush()
+                if progress is not None:
+                    progress(len(chunk))
+
+    os.replace(part_file, file)
+    _update_metadata(key + ".part", None)
+    _update_metadata(key, {"url": url, **_validators(r)})
+    return True
+
+
+def download_and_unzip(
+    url,
+    savedir,
+    filename="",
+    rename=False,
+    force=False,
+    session=None,
+    progress=None,
+    timeout=None,
+):
+    # The archive is kept in the download cache so that it can be revalidated;
+    # members are extracted only when it changed or the target file is missing
+    from zipfile import ZipFile
+
+    file = Path(savedir).joinpath(filename)
+    archive_dir = data_dir("cache", "downloads")
+    archive = f"{hashlib.sha256(url.encode()).hexdigest()[:16]}.zip"
+
+    changed = download(
+        url,
+        archive_dir,
+        archive,
+        force=force,
+        session=session,
+        progress=progress,
+        timeout=timeout,
+    )
+    if not changed and file.exists():
+        return False
+
+    print(f"Unzipping {url}")
     os.makedirs(savedir, exist_ok=True)
-    print(f"Downloading and unzipping {url}")
-    r = requests.get(url, stream=True)
-    zip_file = ZipFile(BytesIO(r.content))
-    zipped_filename = zip_file.namelist()[0]
-    zip_file.extractall(path=savedir)
+    # Reading the archive from disk, members are copied to savedir in chunks
+    with ZipFile(archive_dir.joinpath(archive)) as zip_file:
+        zipped_filename = zip_file.namelist()[0]
+        zip_file.extractall(path=savedir)
     if rename:
-        os.rename(savedir.joinpath(zipped_filename), file)
+        os.replace(Path(savedir).joinpath(zipped_filename), file)
+    return True
 
 
-def download_gsheet(url, savedir, filename, force=False):
+def download_gsheet(url, savedir, filename, force=False, client=None):
     file = savedir.joinpath(filename)
     if not force and file.exists():
         return
     os.makedirs(savedir, exist_ok=True)
     print(f"Downloading from {url}")
 
-    gc = gspread.oauth()
-    gs = gc.open_by_url(url)
-    dfs = {ws.title: pd.DataFrame(ws.get_all_records()) for ws in gs.worksheets()}
+    dfs = fetch_worksheets(url, client=client)
 
     if filename.endswith(".csv"):
         assert len(dfs) == 1
@@ -54,11 +195,6 @@ def download_gsheet(url, savedir, filename, force=False):
         raise ValueError(f"Not supported file format: {filename}")
 
 
-def upload_to_gsheet(df, url, sheet_name):
-    print(f"Uploading to sheet {sheet_name} of {url}")
-
-    gc = gspread.oauth()
-    gs = gc.open_by_url(url)
-    ws = gs.worksheet(sheet_name)
-
-    ws.update([df.columns.values.tolist()] + df.values.tolist())
+def upload_to_gsheet(df, url, sheet_name, client=None):
+    # Only the cells that differ from the current sheet contents are written
+    sync_gsheets([(df, url, sheet_name)], client=client)
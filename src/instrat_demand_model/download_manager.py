@@ -0,0 +1,194 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from instrat_demand_model.config import data_dir
+from instrat_demand_model.download import download, download_and_unzip
+
+# HTTP statuses worth retrying, besides broken connections and timeouts
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class Download:
+    url: str
+    # Directory relative to data/raw
+    directory: str
+    filename: str
+    # Extract the first member of a zip archive to filename
+    unzip: bool = False
+
+    @property
+    def savedir(self):
+        return data_dir("raw", *self.directory.split("/"))
+
+
+def read_manifest(file=None):
+    # CSV with columns url, directory, filename and (optionally) unzip
+    if file is None:
+        file = data_dir("raw", "manifest.csv")
+    df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    return [
+        Download(
+            url=row["url"],
+            directory=row["directory"],
+            filename=row["filename"],
+            unzip=row.get("unzip", "").lower() in ("1", "true", "yes"),
+        )
+        for row in df.to_dict("records")
+    ]
+
+
+def create_session(pool_size):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    # One connection pool per host, large enough for all workers
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Progress:
+    # Thread-safe byte counter reporting per-file and total throughput
+    def __init__(self, n_items):
+        self.n_items = n_items
+        self.n_done = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def counter(self):
+        # Callback for download(); also counts the bytes of a single item
+        count = [0]
+
+        def progress(n_bytes):
+            count[0] += n_bytes
+            with self.lock:
+                self.bytes += n_bytes
+
+        return progress, count
+
+    def finish(self, item, status, n_bytes, seconds):
+        with self.lock:
+            self.n_done += 1
+            rate = n_bytes / seconds / 1e6 if seconds > 0 else 0
+            print(
+                f"[{self.n_done}/{self.n_items}] {item.filename}: {status}"
+                + (f", {n_bytes / 1e6:.1f} MB at {rate:.1f} MB/s" if n_bytes else "")
+            )
+
+    def summary(self):
+        seconds = time.perf_counter() - self.start
+        print(
+            f"Fetched {self.bytes / 1e6:.1f} MB in {seconds:.1f} s"
+            f" ({self.bytes / 1e6 / max(seconds, 1e-9):.1f} MB/s)"
+        )
+
+
+def _is_retryable(error):
+    import requests
+
+    if isinstance(error, requests.HTTPError):
+        return (
+            error.response is not None and error.response.status_code in RETRY_STATUSES
+        )
+    return isinstance(
+        error,
+        (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    )
+
+
+def _fetch(item, session, host_limits, progress, force, retries, backoff, timeout):
+    fetch = download_and_unzip if item.unzip else download
+    kwargs = dict(rename=True) if item.unzip else {}
+    with host_limits[urlsplit(item.url).netloc]:
+        callback, count = progress.counter()
+        start = time.perf_counter()
+        for attempt in range(retries + 1):
+            try:
+                changed = fetch(
+                    item.url,
+                    item.savedir,
+                    item.filename,
+                    force=force,
+                    session=session,
+                    progress=callback,
+                    timeout=timeout,
+                    **kwargs,
+                )
+                break
+            except Exception as e:
+                if attempt == retries or not _is_retryable(e):
+                    raise
+                # Interrupted downloads resume from their .part file
+                delay = backoff * 2**attempt
+                print(f"{item.filename}: {e}, retrying in {delay:.1f} s")
+                time.sleep(delay)
+    status = "downloaded" if changed else "up to date"
+    progress.finish(item, status, count[0], time.perf_counter() - start)
+    return status
+
+
+def download_all(
+    downloads,
+    max_workers=8,
+    max_per_host=4,
+    retries=3,
+    backoff=1.0,
+    timeout=60,
+    force=False,
+):
+    # Fetch all downloads concurrently over one pooled session, with at most
+    # max_per_host requests to the same host at a time. Returns dict of
+    # (directory, filename) -> "downloaded" or "up to date"; raises if any
+    # download failed.
+    session = create_session(max_workers)
+    host_limits = {
+        host: threading.BoundedSemaphore(max_per_host)
+        for host in {urlsplit(item.url).netloc for item in downloads}
+    }
+    progress = Progress(len(downloads))
+
+    status = {}
+    failed = {}
+    with session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            (
+                item,
+                pool.submit(
+                    _fetch,
+                    item,
+                    session,
+                    host_limits,
+                    progress,
+                    force,
+                    retries,
+                    backoff,
+                    timeout,
+                ),
+            )
+            for item in downloads
+        ]
+        for item, future in futures:
+            key = (item.directory, item.filename)
+            try:
+                status[key] = future.result()
+            except Exception as e:
+                print(f"{item.directory}/{item.filename}: failed with {e!r}")
+                failed[key] = e
+
+    progress.summary()
+    if failed:
+        raise RuntimeError(f"Downloads failed: {['/'.join(key) for key in failed]}")
+    return status
@@ -0,0 +1,329 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrat_demand_model.conversion import substitution_operator
+from instrat_demand_model.instrat_demand_model import (
+    initialize,
+    interpolate_rates,
+    rate_segments,
+    step_years,
+)
+
+# Parameter arrays of an ensemble and the axes following the leading sample
+# axis; the period axis holds rates at the breakpoint years of the rate paths
+ENSEMBLE_PARAMETERS = {
+    "demand_change_rates": ("sector", "period"),
+    "space_heat_change_rates": ("period",),
+    "elec_rates": ("sector", "period"),
+    "hydro_rates": ("sector", "period"),
+    "elec_conv": ("sector",),
+    "hydro_conv": ("sector",),
+    "target_elec": ("sector",),
+    "target_hydro": ("sector",),
+}
+
+
+@dataclass
+class EnsembleResult:
+    sectors: pd.Index
+    carriers: pd.Index
+    years: np.ndarray
+    # Dense array of shape (sample, sector, carrier, year)
+    values: np.ndarray
+
+
+def stack_parameters(parameter_sets, sectors, periods):
+    # Convert a list of nested parameter dicts (as passed to
+    # create_sectoral_demand_timeseries) into arrays with a leading sample axis
+    def sector_period_values(rates, key=None):
+        return [
+            [
+                (rates[sector] if key is None else rates[sector][key])[period]
+                for period in periods
+            ]
+            for sector in sectors
+        ]
+
+    params = {name: [] for name in ENSEMBLE_PARAMETERS}
+    for p in parameter_sets:
+        demand_change_rates = {
+            sector: p["demand_change_rates"][sector] for sector in sectors
+        }
+        if "Buildings" in sectors:
+            buildings = demand_change_rates["Buildings"]
+            demand_change_rates["Buildings"] = buildings["Other"]
+            space_heat = [buildings["Heat - space"][period] for period in periods]
+        else:
+            space_heat = [0.0 for period in periods]
+
+        params["demand_change_rates"].append(sector_period_values(demand_change_rates))
+        params["space_heat_change_rates"].append(space_heat)
+        for name in ["elec_rates", "hydro_rates"]:
+            params[name].append(sector_period_values(p[name]))
+        for name in ["elec_conv", "hydro_conv", "target_elec", "target_hydro"]:
+            params[name].append([p[name][sector] for sector in sectors])
+
+    return {name: np.array(values, dtype=float) for name, values in params.items()}
+
+
+def carrier_layout(df_baseline):
+    # Reuse initialize on the row positions to find which baseline row every
+    # model carrier starts from (scaling by 1 keeps the positions exact)
+    positions = pd.Series(
+        np.arange(len(df_baseline.index), dtype=float), index=df_baseline.index
+    )
+    df = initialize(positions, 1.0, 1.0)
+    carriers = df.index
+    source = df.iloc[:, 0].to_numpy().astype(int)
+    return carriers, source
+
+
+def compile_ensemble_chunk(df_baseline, params, carriers, source, periods):
+    sectors = df_baseline.columns
+    is_elec = np.asarray(carriers.str.endswith("electrifiable"))
+    is_hydro = np.asarray(carriers.str.endswith("hydrogenizable"))
+
+    # Initial state (sample, sector, carrier)
+    baseline = df_baseline.to_numpy(dtype=float).T[:, source]
+    scale = np.ones(params["target_elec"].shape + (len(carriers),))
+    scale[..., is_elec] = params["target_elec"][..., None]
+    scale[..., is_hydro] = params["target_hydro"][..., None]
+    x0 = baseline * scale
+
+    # Growth factors (period, sample, sector, carrier), period first so that the
+    # operands of every time step are contiguous
+    g = np.ones((len(periods),) + x0.shape)
+    g += np.moveaxis(params["demand_change_rates"], -1, 0)[..., None]
+    if "Buildings" in sectors:
+        g[:, :, sectors.get_loc("Buildings"), carriers.get_loc("Heat - space")] = (
+            1 + params["space_heat_change_rates"].T
+        )
+
+    # Conversion operators with batch axes (period, sample, sector)
+    m = substitution_operator(
+        carriers,
+        [
+            (
+                np.flatnonzero(sources),
+                carriers.get_loc(target),
+                np.moveaxis(rates, -1, 0),
+                conv,
+            )
+            for sources, target, rates, conv in [
+                (is_elec, "Electricity", params["elec_rates"], params["elec_conv"]),
+                (is_hydro, "Hydrogen", params["hydro_rates"], params["hydro_conv"]),
+            ]
+            if sources.any()
+        ],
+        batch_shape=g.shape[:3],
+    )
+
+    return x0, g, m
+
+
+def default_breakpoints(initial_year, final_year):
+    # First year of every decade of the model horizon
+    return np.unique((step_years(initial_year, final_year) // 10) * 10)
+
+
+def run_ensemble_chunks(
+    df_baseline,
+    params,
+    initial_year=2020,
+    final_year=2050,
+    chunk_size=4096,
+    breakpoints=None,
+    interpolation="step",
+):
+    years = step_years(initial_year, final_year)
+    if breakpoints is None:
+        breakpoints = default_breakpoints(initial_year, final_year)
+    carriers, source = carrier_layout(df_baseline)
+    n_samples = len(params["target_elec"])
+
+    for name, axes in ENSEMBLE_PARAMETERS.items():
+        shape = (n_samples,) + tuple(
+            {"sector": len(df_baseline.columns), "period": len(breakpoints)}[axis]
+            for axis in axes
+        )
+        if params[name].shape != shape:
+            raise ValueError(
+                f"Invalid shape of {name}: {params[name].shape}, expected {shape}"
+            )
+
+    for start in range(0, n_samples, chunk_size):
+        chunk = {
+            name: values[start : start + chunk_size] for name, values in params.items()
+        }
+        # Evaluate the rate paths in every year and keep one period per run of
+        # years with equal rates across the chunk
+        rates = {
+            name: interpolate_rates(breakpoints, chunk[name], years, interpolation)
+            for name, axes in ENSEMBLE_PARAMETERS.items()
+            if "period" in axes
+        }
+        starts, period_index = rate_segments(
+            *[np.moveaxis(values, -1, 0) for values in rates.values()]
+        )
+        chunk.update({name: values[..., starts] for name, values in rates.items()})
+        x0, g, m = compile_ensemble_chunk(df_baseline, chunk, carriers, source, starts)
+
+        m = [m[p] for p in range(len(starts))]
+        x = np.empty((len(period_index) + 1,) + x0.shape)
+        x[0] = x0
+        for t, p in enumerate(period_index):
+            x[t + 1] = g[p] * m[p].apply(x[t])
+        yield start, np.moveaxis(x, 0, -1)
+
+
+def run_ensemble(
+    df_baseline,
+    params,
+    initial_year=2020,
+    final_year=2050,
+    chunk_size=4096,
+    breakpoints=None,
+    interpolation="step",
+):
+    carriers, _ = carrier_layout(df_baseline)
+    years = np.arange(initial_year, final_year + 1)
+    n_samples = len(params["target_elec"])
+
+    values = np.empty((n_samples, len(df_baseline.columns), len(carriers), len(years)))
+    for start, x in run_ensemble_chunks(
+        df_baseline,
+        params,
+        initial_year=initial_year,
+        final_year=final_year,
+        chunk_size=chunk_size,
+        breakpoints=breakpoints,
+        interpolation=interpolation,
+    ):
+        values[start : start + len(x)] = x
+
+    return EnsembleResult(
+        sectors=df_baseline.columns, carriers=carriers, years=years, values=values
+    )
+
+
+def create_ensemble_store(path, n_samples, sectors, carriers, years, dtype="float64"):
+    # Directory with the (sample, sector, carrier, year) values as an .npy file
+    # that is filled through memory maps and a JSON sidecar with axis labels
+    path = Path(path)
+    os.makedirs(path, exist_ok=True)
+    np.lib.format.open_memmap(
+        path.joinpath("values.npy"),
+        mode="w+",
+        dtype=dtype,
+        shape=(n_samples, len(sectors), len(carriers), len(years)),
+    ).flush()
+    with open(path.joinpath("axes.json"), "w") as f:
+        json.dump(
+            {
+                "dims": ["sample", "sector", "carrier", "year"],
+                "sector": list(sectors),
+                "carrier": list(carriers),
+                "year": [int(year) for year in years],
+            },
+            f,
+            indent=2,
+        )
+
+
+def open_ensemble_store(path, mode="r"):
+    # Values are returned as a memory map, so slicing reads only what is used
+    path = Path(path)
+    with open(path.joinpath("axes.json")) as f:
+        axes = json.load(f)
+    return EnsembleResult(
+        sectors=pd.Index(axes["sector"]),
+        carriers=pd.Index(axes["carrier"]),
+        years=np.array(axes["year"]),
+        values=np.load(path.joinpath("values.npy"), mmap_mode=mode),
+    )
+
+
+def write_ensemble_chunk(path, start, values):
+    store = np.load(Path(path, "values.npy"), mmap_mode="r+")
+    store[start : start + len(values)] = values
+    store.flush()
+
+
+def _run_ensemble_slice(
+    path,
+    start,
+    df_baseline,
+    params,
+    initial_year,
+    final_year,
+    breakpoints,
+    interpolation,
+):
+    for offset, x in run_ensemble_chunks(
+        df_baseline,
+        params,
+        initial_year=initial_year,
+        final_year=final_year,
+        chunk_size=len(params["target_elec"]),
+        breakpoints=breakpoints,
+        interpolation=interpolation,
+    ):
+        write_ensemble_chunk(path, start + offset, x)
+
+
+def run_ensemble_to_store(
+    df_baseline,
+    params,
+    path,
+    initial_year=2020,
+    final_year=2050,
+    chunk_size=4096,
+    max_workers=1,
+    dtype="float64",
+    breakpoints=None,
+    interpolation="step",
+):
+    # Stream chunks of samples into an ensemble store, so that at most
+    # max_workers chunks are held in memory at a time
+    carriers, _ = carrier_layout(df_baseline)
+    n_samples = len(params["target_elec"])
+    create_ensemble_store(
+        path,
+        n_samples,
+        df_baseline.columns,
+        carriers,
+        np.arange(initial_year, final_year + 1),
+        dtype=dtype,
+    )
+
+    tasks = [
+        (
+            path,
+            start,
+            df_baseline,
+            {
+                name: values[start : start + chunk_size]
+                for name, values in params.items()
+            },
+            initial_year,
+            final_year,
+            breakpoints,
+            interpolation,
+        )
+        for start in range(0, n_samples, chunk_size)
+    ]
+    if max_workers == 1:
+        for task in tasks:
+            _run_ensemble_slice(*task)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for future in [pool.submit(_run_ensemble_slice, *task) for task in tasks]:
+                future.result()
+
+    return open_ensemble_store(path)
@@ -0,0 +1,153 @@
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+# Eurostat geo codes of the EU member states (Greece is EL)
+EU27 = [
+    "AT",
+    "BE",
+    "BG",
+    "CY",
+    "CZ",
+    "DE",
+    "DK",
+    "EE",
+    "EL",
+    "ES",
+    "FI",
+    "FR",
+    "HR",
+    "HU",
+    "IE",
+    "IT",
+    "LT",
+    "LU",
+    "LV",
+    "MT",
+    "NL",
+    "PL",
+    "PT",
+    "RO",
+    "SE",
+    "SI",
+    "SK",
+]
+
+# Columns of the nrg_bal_c SDMX-CSV files (bulk download or custom extract)
+# that are kept when ingesting them
+NRG_BAL_DTYPES = {
+    "nrg_bal": "category",
+    "siec": "category",
+    "unit": "category",
+    "geo": "category",
+    "TIME_PERIOD": "int64",
+    "OBS_VALUE": "float64",
+}
+
+
+def _nrg_bal_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            (name, pa.string() if dtype == "category" else pa.from_numpy_dtype(dtype))
+            for name, dtype in NRG_BAL_DTYPES.items()
+        ]
+    )
+
+
+def ingest_nrg_bal(
+    raw_file,
+    cache_file,
+    geo=None,
+    years=None,
+    nrg_bal=None,
+    siec=None,
+    unit="TJ",
+    chunksize=1_000_000,
+    force=False,
+):
+    # Stream an nrg_bal_c CSV (optionally compressed) in chunks, keep only the
+    # rows matching the filters and append them to a Parquet file, so that
+    # memory use is bounded by the chunk size rather than the file size.
+    # The cache is reused if it is newer than the raw file and was built from
+    # the same file with the same filters. Returns True if it was rebuilt.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    filters = {
+        "geo": geo,
+        "TIME_PERIOD": years,
+        "nrg_bal": nrg_bal,
+        "siec": siec,
+        "unit": [unit] if isinstance(unit, str) else unit,
+    }
+    filters = {
+        key: list(values) for key, values in filters.items() if values is not None
+    }
+    ingest = json.dumps(
+        {
+            "raw_file": str(Path(raw_file).resolve()),
+            "filters": {
+                key: sorted(map(str, values)) for key, values in filters.items()
+            },
+        },
+        sort_keys=True,
+    ).encode()
+
+    cache_file = Path(cache_file)
+    if (
+        not force
+        and cache_file.exists()
+        and cache_file.stat().st_mtime >= Path(raw_file).stat().st_mtime
+        and (pq.read_schema(cache_file).metadata or {}).get(b"ingest") == ingest
+    ):
+        print(f"{cache_file} is up to date with {raw_file}")
+        return False
+
+    os.makedirs(cache_file.parent, exist_ok=True)
+    tmp_file = cache_file.with_suffix(".tmp")
+    schema = _nrg_bal_schema().with_metadata({b"ingest": ingest})
+
+    n_rows = 0
+    with pq.ParquetWriter(tmp_file, schema) as writer:
+        for chunk in pd.read_csv(
+            raw_file,
+            usecols=list(NRG_BAL_DTYPES.keys()),
+            dtype=NRG_BAL_DTYPES,
+            chunksize=chunksize,
+        ):
+            mask = pd.Series(True, index=chunk.index)
+            for key, values in filters.items():
+                mask &= chunk[key].isin(values)
+            chunk = chunk[mask & chunk["OBS_VALUE"].notna()]
+            if len(chunk) == 0:
+                continue
+            chunk = chunk.astype(
+                {
+                    key: str
+                    for key, dtype in NRG_BAL_DTYPES.items()
+                    if dtype == "category"
+                }
+            )
+            writer.write_table(
+                pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            )
+            n_rows += len(chunk)
+    os.replace(tmp_file, cache_file)
+
+    print(f"Ingested {n_rows} rows from {raw_file} into {cache_file}")
+    return True
+
+
+def read_nrg_bal(cache_file, columns=None):
+    df = pd.read_parquet(cache_file, columns=columns)
+    return df.astype(
+        {
+            key: "category"
+            for key, dtype in NRG_BAL_DTYPES.items()
+            if dtype == "category" and key in df.columns
+        }
+    )
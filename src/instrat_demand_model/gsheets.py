@@ -0,0 +1,187 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Google Sheets API quota: 60 read and 60 write requests per minute per user
+REQUESTS_PER_MINUTE = 60
+
+
+@lru_cache(maxsize=None)
+def gspread_client():
+    # Authenticate once per process; the client is shared by all threads
+    import gspread
+
+    return gspread.oauth()
+
+
+class RateLimiter:
+    # Spaces out calls made from any thread to at most per_minute per minute
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE):
+        self.interval = 60 / per_minute
+        self.next = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next)
+            self.next = start + self.interval
+        time.sleep(start - now)
+
+
+def _call(limiter, method, *args, retries=5, **kwargs):
+    # API call within the rate limit, backing off when the quota is exceeded
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status != 429 or attempt == retries:
+                raise
+            time.sleep(2**attempt)
+
+
+def column_letter(col):
+    # 1 -> A, 27 -> AA
+    letters = ""
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def a1_range(row, col, n_rows, n_cols):
+    # Zero-based top left cell and size -> A1 notation
+    start = f"{column_letter(col + 1)}{row + 1}"
+    end = f"{column_letter(col + n_cols)}{row + n_rows}"
+    return start if start == end else f"{start}:{end}"
+
+
+def _normalize(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
+
+
+def frame_to_rows(df):
+    # Header and values as plain Python objects, NaN as empty cells
+    return [[_normalize(col) for col in df.columns]] + [
+        [_normalize(value) for value in row] for row in df.itertuples(index=False)
+    ]
+
+
+def cell_diff(old, new):
+    # Ranges that turn the sheet contents old into new, as a list of
+    # {"range", "values"} for batch_update. Changed cells are grouped into
+    # horizontal runs per row, and identical runs on consecutive rows are
+    # merged into rectangles. Cells of old outside new are cleared.
+    n_rows = max(len(old), len(new))
+    n_cols = max([len(row) for row in old + new], default=0)
+
+    def cell(rows, i, j):
+        return rows[i][j] if i < len(rows) and j < len(rows[i]) else ""
+
+    runs = []
+    for i in range(n_rows):
+        j = 0
+        while j < n_cols:
+            if _normalize(cell(old, i, j)) == _normalize(cell(new, i, j)):
+                j += 1
+                continue
+            start = j
+            while j < n_cols and _normalize(cell(old, i, j)) != _normalize(
+                cell(new, i, j)
+            ):
+                j += 1
+            runs.append((i, start, j))
+
+    updates = []
+    for i, start, end in runs:
+        previous = updates[-1] if updates else None
+        if (
+            previous is not None
+            and previous["cols"] == (start, end)
+            and previous["row"] + len(previous["values"]) == i
+        ):
+            previous["values"].append([cell(new, i, j) for j in range(start, end)])
+        else:
+            updates.append(
+                {
+                    "row": i,
+                    "cols": (start, end),
+                    "values": [[cell(new, i, j) for j in range(start, end)]],
+                }
+            )
+    return [
+        {
+            "range": a1_range(
+                u["row"], u["cols"][0], len(u["values"]), u["cols"][1] - u["cols"][0]
+            ),
+            "values": u["values"],
+        }
+        for u in updates
+    ]
+
+
+def sync_worksheet(ws, df, limiter):
+    # Fetch the sheet once and write only the cells that differ from df.
+    # Returns the number of cells written.
+    rows = frame_to_rows(df)
+    current = _call(limiter, ws.get_all_values, value_render_option="UNFORMATTED_VALUE")
+    n_cols = max(len(row) for row in rows)
+    if len(rows) > ws.row_count or n_cols > ws.col_count:
+        _call(
+            limiter,
+            ws.resize,
+            rows=max(len(rows), ws.row_count),
+            cols=max(n_cols, ws.col_count),
+        )
+    updates = cell_diff(current, rows)
+    if updates:
+        _call(limiter, ws.batch_update, updates)
+    return sum(len(u["values"]) * len(u["values"][0]) for u in updates)
+
+
+def sync_gsheets(uploads, client=None, max_workers=4, limiter=None):
+    # uploads: list of (df, url, sheet_name). Spreadsheets are synced
+    # concurrently, sharing one client and one rate limit.
+    if client is None:
+        client = gspread_client()
+    if limiter is None:
+        limiter = RateLimiter()
+
+    def sync(df, url, sheet_name):
+        gs = _call(limiter, client.open_by_url, url)
+        ws = _call(limiter, gs.worksheet, sheet_name)
+        n_cells = sync_worksheet(ws, df, limiter)
+        print(f"Synced sheet {sheet_name} of {url}: {n_cells} cells changed")
+        return n_cells
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(sync, *upload) for upload in uploads]
+        return [future.result() for future in futures]
+
+
+def fetch_worksheets(url, client=None, max_workers=4, limiter=None):
+    # dict of worksheet title -> DataFrame, with worksheets read in parallel
+    if client is None:
+        client = gspread_client()
+    if limiter is None:
+        limiter = RateLimiter()
+
+    gs = _call(limiter, client.open_by_url, url)
+    worksheets = _call(limiter, gs.worksheets)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        records = pool.map(lambda ws: _call(limiter, ws.get_all_records), worksheets)
+        return {ws.title: pd.DataFrame(r) for ws, r in zip(worksheets, records)}
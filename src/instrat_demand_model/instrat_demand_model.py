@@ -1,7 +1,12 @@
+from dataclasses import dataclass
+import hashlib
+import json
+
 import pandas as pd
 import numpy as np
 
 from instrat_demand_model.config import data_dir
+from instrat_demand_model.conversion import ConversionOperator, Pathway, edge_operator
 
 
 def preprocess_baseline_demand(df):
@@ -49,20 +54,22 @@ def create_conversion_matrix(
     hydro_rates,
     elec_conv,
     hydro_conv,
+    interpolation="step",
 ):
-    period = (year // 10) * 10
+    elec_rate = rate_values(elec_rates, [year], interpolation)[0]
+    hydro_rate = rate_values(hydro_rates, [year], interpolation)[0]
 
     m = pd.DataFrame(data=np.identity(len(carriers)), index=carriers, columns=carriers)
 
     electrifiable_carriers = carriers[carriers.str.endswith("electrifiable")]
-    m.loc["Electricity", electrifiable_carriers] = elec_conv * elec_rates[period]
+    m.loc["Electricity", electrifiable_carriers] = elec_conv * elec_rate
     for carrier in electrifiable_carriers:
-        m.loc[carrier, carrier] = 1 - elec_rates[period]
+        m.loc[carrier, carrier] = 1 - elec_rate
 
     hydrogenizable_carriers = carriers[carriers.str.endswith("hydrogenizable")]
-    m.loc["Hydrogen", hydrogenizable_carriers] = hydro_conv * hydro_rates[period]
+    m.loc["Hydrogen", hydrogenizable_carriers] = hydro_conv * hydro_rate
     for carrier in hydrogenizable_carriers:
-        m.loc[carrier, carrier] = 1 - hydro_rates[period]
+        m.loc[carrier, carrier] = 1 - hydro_rate
 
     return m
 
@@ -72,21 +79,138 @@ def create_growth_vector(
     carriers,
     sector,
     demand_change_rates,
+    interpolation="step",
 ):
-    period = (year // 10) * 10
+    def rate(rates):
+        return rate_values(rates, [year], interpolation)[0]
 
     g = pd.Series(data=np.ones(len(carriers)), index=carriers)
 
     if sector != "Buildings":
-        g += demand_change_rates[period]
+        g += rate(demand_change_rates)
     else:
-        g.loc[g.index != "Heat - space"] += demand_change_rates["Other"][period]
-        g.loc["Heat - space"] += demand_change_rates["Heat - space"][period]
+        g.loc[g.index != "Heat - space"] += rate(demand_change_rates["Other"])
+        g.loc["Heat - space"] += rate(demand_change_rates["Heat - space"])
 
     return g
 
 
-def create_sectoral_demand_timeseries(
+@dataclass
+class SectorModel:
+    carriers: pd.Index
+    years: np.ndarray
+    x0: np.ndarray
+    # Consecutive years with equal rates form one period; growth and conversion
+    # are stored once per period and each time step refers to its period by index
+    period_index: np.ndarray
+    growth: np.ndarray
+    conversion: ConversionOperator
+
+
+# Interpolation of rate paths between their breakpoint years
+INTERPOLATIONS = ["step", "linear", "scurve"]
+
+
+def step_years(initial_year, final_year):
+    # Years whose rates drive the step to the following year
+    return np.arange(initial_year, final_year)
+
+
+def interpolate_rates(breakpoints, values, years, interpolation="step"):
+    # Rate paths given at sorted breakpoint years (along the last axis of
+    # values) evaluated in every year. "step" holds the rate of the latest
+    # breakpoint, "linear" and "scurve" (smoothstep) ramp between breakpoints.
+    # Rates are held constant before the first and after the last breakpoint.
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(f"Invalid interpolation: {interpolation}")
+    breakpoints = np.asarray(breakpoints)
+    values = np.asarray(values, dtype=float)
+    years = np.asarray(years)
+
+    i = np.clip(np.searchsorted(breakpoints, years, side="right") - 1, 0, None)
+    if interpolation == "step" or len(breakpoints) == 1:
+        return values[..., i]
+
+    j = np.minimum(i + 1, len(breakpoints) - 1)
+    span = np.maximum(breakpoints[j] - breakpoints[i], 1)
+    f = np.clip((years - breakpoints[i]) / span, 0.0, 1.0)
+    if interpolation == "scurve":
+        f = f * f * (3 - 2 * f)
+    return values[..., i] + f * (values[..., j] - values[..., i])
+
+
+def rate_values(rates, years, interpolation="step"):
+    # rates: mapping or Series of breakpoint year -> rate
+    if not isinstance(rates, pd.Series):
+        rates = pd.Series(rates, dtype=float)
+    rates = rates.sort_index()
+    if len(rates) == 0 or rates.isna().any():
+        raise ValueError(f"Invalid rate path: {rates.to_dict()}")
+    return interpolate_rates(
+        rates.index.to_numpy(), rates.to_numpy(dtype=float), years, interpolation
+    )
+
+
+def rate_segments(*arrays):
+    # Split the time steps (leading axis of all arrays) into runs of steps with
+    # identical values; returns the first step of every run and the run index
+    # of every step
+    n_steps = len(arrays[0])
+    if n_steps <= 1:
+        return np.arange(n_steps), np.zeros(n_steps, dtype=int)
+    changed = np.zeros(n_steps, dtype=bool)
+    changed[:1] = True
+    for a in arrays:
+        changed[1:] |= (a[1:] != a[:-1]).reshape(n_steps - 1, -1).any(axis=1)
+    return np.flatnonzero(changed), np.cumsum(changed) - 1
+
+
+def compile_growth_rates(
+    years, carriers, sector, demand_change_rates, interpolation="step"
+):
+    g = np.ones((len(years), len(carriers)))
+
+    if sector != "Buildings":
+        g += rate_values(demand_change_rates, years, interpolation)[:, None]
+    else:
+        is_space_heat = np.asarray(carriers == "Heat - space")
+        g[:, ~is_space_heat] += rate_values(
+            demand_change_rates["Other"], years, interpolation
+        )[:, None]
+        g[:, is_space_heat] += rate_values(
+            demand_change_rates["Heat - space"], years, interpolation
+        )[:, None]
+
+    return g
+
+
+def default_pathways(carriers, elec_rates, hydro_rates, elec_conv, hydro_conv):
+    return [
+        Pathway(source=carrier, target=target, rates=rates, efficiency=conv)
+        for suffix, target, rates, conv in [
+            ("electrifiable", "Electricity", elec_rates, elec_conv),
+            ("hydrogenizable", "Hydrogen", hydro_rates, hydro_conv),
+        ]
+        for carrier in carriers[carriers.str.endswith(suffix)]
+    ]
+
+
+def compile_conversion_operator(years, carriers, pathways, interpolation="step"):
+    sources = carriers.get_indexer([p.source for p in pathways])
+    targets = carriers.get_indexer([p.target for p in pathways])
+    if (sources < 0).any() or (targets < 0).any():
+        unknown = {p.source for p in pathways} | {p.target for p in pathways}
+        raise ValueError(f"Unknown carriers in pathways: {unknown - set(carriers)}")
+
+    rates = np.array(
+        [rate_values(p.rates, years, interpolation) for p in pathways], dtype=float
+    ).reshape(len(pathways), len(years))
+    efficiency = np.array([p.efficiency for p in pathways], dtype=float)
+
+    return edge_operator(len(carriers), sources, targets, rates.T, efficiency)
+
+
+def compile_sectoral_model(
     sector,
     df_baseline,
     demand_change_rates,
@@ -98,6 +222,8 @@ def create_sectoral_demand_timeseries(
     hydro_conv,
     initial_year=2020,
     final_year=2050,
+    pathways=None,
+    interpolation="step",
 ):
     df = initialize(
         df_baseline[sector],
@@ -105,26 +231,169 @@ def create_sectoral_demand_timeseries(
         target_hydro[sector],
         initial_year=initial_year,
     )
-    carriers = df.index
-
-    for year in range(initial_year, final_year):
-        growth_vector = create_growth_vector(
-            year,
-            carriers,
-            sector,
-            demand_change_rates[sector],
-        )
-        conversion_matrix = create_conversion_matrix(
-            year,
-            carriers,
-            elec_rates[sector],
-            hydro_rates[sector],
-            elec_conv[sector],
-            hydro_conv[sector],
-        )
-        df[year + 1] = growth_vector * (conversion_matrix @ df[year])
 
-    return df
+    pathways = default_pathways(
+        df.index,
+        elec_rates[sector],
+        hydro_rates[sector],
+        elec_conv[sector],
+        hydro_conv[sector],
+    ) + (pathways.get(sector, []) if pathways is not None else [])
 
+    # Carriers produced only by additional pathways start from zero demand
+    targets = pd.Index([p.target for p in pathways]).unique()
+    carriers = df.index.append(targets[~targets.isin(df.index)]).rename(df.index.name)
+    df = df.reindex(carriers, fill_value=0.0)
 
+    # Rate paths are evaluated for every year up front, and years with equal
+    # rates are merged so that the time stepping does not depend on them
+    years = step_years(initial_year, final_year)
+    growth = compile_growth_rates(
+        years, carriers, sector, demand_change_rates[sector], interpolation
+    )
+    conversion = compile_conversion_operator(years, carriers, pathways, interpolation)
+    starts, period_index = rate_segments(growth, conversion.diagonal, conversion.values)
 
+    return SectorModel(
+        carriers=carriers,
+        years=np.arange(initial_year, final_year + 1),
+        x0=df[initial_year].to_numpy(dtype=float),
+        period_index=period_index,
+        growth=growth[starts],
+        conversion=conversion[starts],
+    )
+
+
+def matrix_powers(a, n):
+    # Stack a^0, ..., a^n along a new axis before the last two, doubling the
+    # number of known powers with every batched matmul
+    powers = np.broadcast_to(
+        np.identity(a.shape[-1]), a.shape[:-2] + (1,) + a.shape[-2:]
+    )
+    base = a[..., None, :, :]
+    while powers.shape[-3] <= n:
+        powers = np.concatenate([powers, base @ powers], axis=-3)
+        base = base @ base
+    return powers[..., : n + 1, :, :]
+
+
+def period_ends(model):
+    # Position of the state at the end of each period in the trajectory
+    return np.cumsum(np.bincount(model.period_index, minlength=len(model.growth)))
+
+
+def propagate_stepwise(model, x, first_period=0):
+    conversion = [model.conversion[p] for p in range(len(model.growth))]
+    start = period_ends(model)[first_period - 1] if first_period > 0 else 0
+    for t in range(start, len(model.period_index)):
+        p = model.period_index[t]
+        x[t + 1] = model.growth[p] * conversion[p].apply(x[t])
+    return x
+
+
+def propagate_by_period(model, x, first_period=0):
+    # The operator diag(g) @ M is constant within a period, so all years of a
+    # period follow from the powers of a single matrix applied to its first state
+    steps = np.bincount(model.period_index, minlength=len(model.growth))
+    operators = model.growth[:, :, None] * model.conversion.to_dense()
+    powers = matrix_powers(operators[first_period:], steps.max(initial=0))
+
+    start = steps[:first_period].sum()
+    for p, n in enumerate(steps[first_period:]):
+        x[start + 1 : start + n + 1] = powers[p, 1 : n + 1] @ x[start]
+        start += n
+    return x
+
+
+def checkpoint_keys(model):
+    # Rolling hash over everything that determines the trajectory up to the
+    # end of each period, so that a key stays valid as long as no earlier
+    # input changes
+    h = hashlib.sha256()
+    h.update(json.dumps([str(carrier) for carrier in model.carriers]).encode())
+    h.update(model.x0.tobytes())
+    h.update(model.conversion.rows.tobytes())
+    h.update(model.conversion.cols.tobytes())
+
+    steps = np.bincount(model.period_index, minlength=len(model.growth))
+    keys = []
+    for p, n in enumerate(steps):
+        h.update(np.int64(n).tobytes())
+        h.update(model.growth[p].tobytes())
+        h.update(model.conversion.diagonal[p].tobytes())
+        h.update(model.conversion.values[p].tobytes())
+        keys.append(h.copy().hexdigest())
+    return keys
+
+
+def propagate(model, method="stepwise", checkpoints=None):
+    # checkpoints: optional dict-like of trajectory prefixes up to the end of
+    # a period, keyed by checkpoint_keys. The propagation resumes after the
+    # latest period whose prefix is found and stores the prefixes it computes.
+    if method == "stepwise":
+        propagate_from = propagate_stepwise
+    elif method == "period":
+        propagate_from = propagate_by_period
+    else:
+        raise ValueError(f"Invalid propagation method: {method}")
+
+    x = np.empty((len(model.years), len(model.carriers)))
+    x[0] = model.x0
+    first_period = 0
+
+    if checkpoints is not None:
+        keys = checkpoint_keys(model)
+        ends = period_ends(model)
+        for p in reversed(range(len(keys))):
+            prefix = checkpoints.get(keys[p])
+            if prefix is not None:
+                x[: ends[p] + 1] = prefix
+                first_period = p + 1
+                break
+
+    propagate_from(model, x, first_period=first_period)
+
+    if checkpoints is not None:
+        for p in range(first_period, len(keys)):
+            checkpoints[keys[p]] = x[: ends[p] + 1].copy()
+
+    return x
+
+
+def to_frame(model, x):
+    return pd.DataFrame(data=x.T, index=model.carriers, columns=model.years.tolist())
+
+
+def create_sectoral_demand_timeseries(
+    sector,
+    df_baseline,
+    demand_change_rates,
+    target_elec,
+    target_hydro,
+    elec_rates,
+    hydro_rates,
+    elec_conv,
+    hydro_conv,
+    initial_year=2020,
+    final_year=2050,
+    pathways=None,
+    interpolation="step",
+    method="stepwise",
+    checkpoints=None,
+):
+    model = compile_sectoral_model(
+        sector,
+        df_baseline,
+        demand_change_rates,
+        target_elec,
+        target_hydro,
+        elec_rates,
+        hydro_rates,
+        elec_conv,
+        hydro_conv,
+        initial_year=initial_year,
+        final_year=final_year,
+        pathways=pathways,
+        interpolation=interpolation,
+    )
+    return to_frame(model, propagate(model, method=method, checkpoints=checkpoints))
@@ -1,17 +1,164 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import importlib.util
 import itertools
+import json
+import os
+from pathlib import Path
+import threading
+
 import pandas as pd
 
+from instrat_demand_model.config import data_dir
 
-def read_excel(file, sheet_var=None, sheet_name=0, ignore_sheets=False):
-    if sheet_var is None:
-        return pd.read_excel(file, sheet_name=sheet_name)
+# Guards the index of workbook hashes kept in the Excel cache directory
+_hash_lock = threading.Lock()
+
+
+def excel_cache_dir(*path):
+    return data_dir("cache", "excel", *path)
+
+
+def excel_engine():
+    # calamine (Rust) parses much faster than openpyxl when installed; otherwise
+    # pandas picks its default engine (openpyxl in read-only mode for xlsx)
+    if importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    return None
+
+
+def workbook_hash(file):
+    # sha256 of the workbook, read from the index while its mtime and size
+    # are unchanged
+    file = Path(file).resolve()
+    stat = file.stat()
+    index_file = excel_cache_dir("hashes.json")
+    with _hash_lock:
+        index = json.loads(index_file.read_text()) if index_file.exists() else {}
+        entry = index.get(str(file))
+        if entry and [entry["mtime_ns"], entry["size"]] == [
+            stat.st_mtime_ns,
+            stat.st_size,
+        ]:
+            return entry["sha256"]
+
+        sha256 = hashlib.sha256(file.read_bytes()).hexdigest()
+        index[str(file)] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": sha256,
+        }
+        os.makedirs(index_file.parent, exist_ok=True)
+        tmp_file = index_file.with_suffix(".tmp")
+        tmp_file.write_text(json.dumps(index, indent=2, sort_keys=True))
+        os.replace(tmp_file, index_file)
+        return sha256
+
+
+def _read_sheet(file, sheet_name, engine):
+    return pd.read_excel(file, sheet_name=sheet_name, engine=engine)
+
+
+def read_sheets(file, sheet_names=None, max_workers=None):
+    # dict of sheet name -> DataFrame, with sheets parsed in worker processes
+    # (parsing holds the GIL, so threads would not help)
+    engine = excel_engine()
+    if sheet_names is None:
+        with pd.ExcelFile(file, engine=engine) as excel_file:
+            sheet_names = excel_file.sheet_names
+    if max_workers is None:
+        max_workers = min(len(sheet_names), os.cpu_count() or 1)
+
+    if max_workers <= 1 or len(sheet_names) <= 1:
+        dfs = [_read_sheet(file, name, engine) for name in sheet_names]
     else:
-        dfs = pd.read_excel(file, sheet_name=None)
-        if ignore_sheets:
-            dfs = {key: df for key, df in dfs.items() if not key.startswith("#")}
-        df_full = pd.concat([df.assign(**{sheet_var: val}) for val, df in dfs.items()])
-        df_full[sheet_var] = pd.to_numeric(df_full[sheet_var], errors="ignore")
-        return df_full
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            dfs = list(
+                pool.map(
+                    _read_sheet,
+                    itertools.repeat(file),
+                    sheet_names,
+                    itertools.repeat(engine),
+                )
+            )
+    return dict(zip(sheet_names, dfs))
+
+
+def _write_parquet(df, file):
+    # Parquet needs string column names; the original names (e.g. years read
+    # as integers) are kept in the schema metadata. Frames that cannot be
+    # stored (mixed type columns, unusual headers) are not cached.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = [str(col) for col in df.columns]
+    if len(set(columns)) < len(columns):
+        return
+    try:
+        original = json.dumps(df.columns.tolist())
+        table = pa.Table.from_pandas(df.set_axis(columns, axis=1))
+    except (TypeError, ValueError, pa.ArrowException):
+        return
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, b"columns": original.encode()}
+    )
+    os.makedirs(file.parent, exist_ok=True)
+    tmp_file = file.with_suffix(".tmp")
+    pq.write_table(table, tmp_file)
+    os.replace(tmp_file, file)
+
+
+def _read_parquet(file):
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(file)
+    df = table.to_pandas()
+    df.columns = json.loads(table.schema.metadata[b"columns"])
+    return df
+
+
+def _parse_excel(file, sheet_var, sheet_name, ignore_sheets, max_workers):
+    if sheet_var is None:
+        return pd.read_excel(file, sheet_name=sheet_name, engine=excel_engine())
+
+    dfs = read_sheets(file, max_workers=max_workers)
+    if ignore_sheets:
+        dfs = {key: df for key, df in dfs.items() if not key.startswith("#")}
+    # Coerce the sheet names once instead of the whole concatenated column
+    values = pd.Series(list(dfs.keys()), dtype=object)
+    try:
+        values = pd.to_numeric(values)
+    except (ValueError, TypeError):
+        pass
+    return pd.concat(
+        [df.assign(**{sheet_var: val}) for val, df in zip(values, dfs.values())]
+    )
+
+
+def read_excel(
+    file,
+    sheet_var=None,
+    sheet_name=0,
+    ignore_sheets=False,
+    cache=True,
+    max_workers=None,
+):
+    # Parsed frames are cached as Parquet keyed by the workbook hash (computed
+    # again only when the workbook mtime or size changes) and the arguments
+    if not cache:
+        return _parse_excel(file, sheet_var, sheet_name, ignore_sheets, max_workers)
+
+    key = hashlib.sha256(
+        json.dumps([workbook_hash(file), sheet_var, sheet_name, ignore_sheets]).encode()
+    ).hexdigest()[:16]
+    cache_file = excel_cache_dir(f"{Path(file).stem}-{key}.parquet")
+    if cache_file.exists():
+        return _read_parquet(cache_file)
+
+    df = _parse_excel(file, sheet_var, sheet_name, ignore_sheets, max_workers)
+    if isinstance(df, pd.DataFrame):
+        _write_parquet(df, cache_file)
+    return df
 
 
 def product_dict(**kwargs):
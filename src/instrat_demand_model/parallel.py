@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from instrat_demand_model.cache import cell_key
+from instrat_demand_model.instrat_demand_model import (
+    create_sectoral_demand_timeseries,
+)
+
+# Baseline demand per geo shared by all cells computed in a worker process, set
+# once by the pool initializer instead of being pickled with every task
+_baselines = None
+
+
+def _init_worker(baselines):
+    global _baselines
+    _baselines = baselines
+
+
+def _run_cell(geo, sector, params, initial_year, final_year, baselines=None):
+    return create_sectoral_demand_timeseries(
+        sector,
+        (baselines if baselines is not None else _baselines)[geo],
+        **params,
+        initial_year=initial_year,
+        final_year=final_year,
+    )
+
+
+def run_countries(
+    baselines,
+    scenarios,
+    max_workers=None,
+    executor="process",
+    initial_year=2020,
+    final_year=2050,
+    cache=None,
+):
+    # baselines: dict of geo -> preprocessed baseline demand
+    # scenarios: dict of scenario name -> keyword arguments of
+    # create_sectoral_demand_timeseries (demand_change_rates, target_elec, ...)
+    # Returns dict of geo -> scenario name -> sector -> demand timeseries, in
+    # the order of baselines, scenarios and baseline columns. All
+    # (geo, scenario, sector) cells share one pool. With a SectorCache, only
+    # the cells whose baseline or sector parameters changed are recomputed.
+    cells = [
+        (geo, scenario, sector)
+        for geo, df_baseline in baselines.items()
+        for scenario in scenarios
+        for sector in df_baseline
+    ]
+
+    results = {}
+    keys = {}
+    if cache is not None:
+        for geo, scenario, sector in cells:
+            key = cell_key(
+                sector, baselines[geo], scenarios[scenario], initial_year, final_year
+            )
+            df = cache.get(key)
+            if df is not None:
+                results[geo, scenario, sector] = df
+            keys[geo, scenario, sector] = key
+    pending = [cell for cell in cells if cell not in results]
+
+    if max_workers == 1 or len(pending) <= 1:
+        computed = [
+            _run_cell(
+                geo, sector, scenarios[scenario], initial_year, final_year, baselines
+            )
+            for geo, scenario, sector in pending
+        ]
+    else:
+        if executor == "process":
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(baselines,),
+            )
+            shared = None
+        elif executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+            shared = baselines
+        else:
+            raise ValueError(f"Invalid executor: {executor}")
+
+        with pool:
+            futures = [
+                pool.submit(
+                    _run_cell,
+                    geo,
+                    sector,
+                    scenarios[scenario],
+                    initial_year,
+                    final_year,
+                    shared,
+                )
+                for geo, scenario, sector in pending
+            ]
+            computed = [future.result() for future in futures]
+
+    for cell, df in zip(pending, computed):
+        results[cell] = df
+        if cache is not None:
+            cache.put(keys[cell], df)
+
+    output = {geo: {scenario: {} for scenario in scenarios} for geo in baselines}
+    for geo, scenario, sector in cells:
+        output[geo][scenario][sector] = results[geo, scenario, sector]
+    return output
+
+
+def run_scenarios(df_baseline, scenarios, **kwargs):
+    # Single country version of run_countries, returning
+    # dict of scenario name -> dict of sector -> demand timeseries
+    return run_countries({None: df_baseline}, scenarios, **kwargs)[None]
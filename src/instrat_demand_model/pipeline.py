@@ -0,0 +1,149 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+from instrat_demand_model.config import data_dir, project_dir
+
+
+@dataclass
+class Stage:
+    name: str
+    script: Path
+    inputs: list
+    outputs: list
+    # Source files besides the script whose changes should rerun the stage
+    code: list = field(default_factory=list)
+    # Command line arguments of the script
+    args: list = field(default_factory=list)
+
+
+def hash_path(h, path):
+    path = Path(path)
+    if path.is_dir():
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            h.update(str(file.relative_to(path)).encode())
+            h.update(file.read_bytes())
+    elif path.exists():
+        h.update(path.read_bytes())
+    else:
+        h.update(b"<missing>")
+
+
+def fingerprint(stage):
+    h = hashlib.sha256()
+    h.update(json.dumps([str(arg) for arg in stage.args]).encode())
+    for path in [stage.script] + list(stage.code) + list(stage.inputs):
+        h.update(str(path).encode())
+        hash_path(h, path)
+    return h.hexdigest()
+
+
+def load_state(state_file):
+    if not Path(state_file).exists():
+        return {}
+    with open(state_file) as f:
+        return json.load(f)
+
+
+def save_state(state, state_file):
+    os.makedirs(Path(state_file).parent, exist_ok=True)
+    with open(state_file, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def run_stage(stage, previous_fingerprint, force=False):
+    # Returns (status, fingerprint) with status "skipped" or "done"
+    key = fingerprint(stage)
+    outputs_exist = all(Path(output).exists() for output in stage.outputs)
+
+    if not force and outputs_exist and key == previous_fingerprint:
+        return "skipped", key
+    missing = [str(path) for path in stage.inputs if not Path(path).exists()]
+    if missing and outputs_exist:
+        print(f"[{stage.name}] inputs missing, keeping existing outputs: {missing}")
+        return "skipped", previous_fingerprint
+
+    print(f"[{stage.name}] running {stage.script}")
+    # Make sure the stage imports this copy of the package
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(Path(__file__).parents[1])]
+        + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    result = subprocess.run(
+        [sys.executable, str(stage.script)] + [str(arg) for arg in stage.args],
+        cwd=project_dir(),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    output = (result.stdout + result.stderr).strip()
+    if output:
+        print("\n".join(f"[{stage.name}] {line}" for line in output.splitlines()))
+    if result.returncode != 0:
+        raise RuntimeError(f"Stage {stage.name} failed")
+    return "done", key
+
+
+def run_pipeline(stages, max_workers=None, force=False, state_file=None):
+    # Run stages in dependency order (a stage depends on the stages producing
+    # its inputs), skipping those whose inputs and code are unchanged since
+    # their last successful run. Independent stages run concurrently.
+    if state_file is None:
+        state_file = data_dir("cache", "pipeline.json")
+    state = load_state(state_file)
+
+    producers = {
+        Path(output): stage.name for stage in stages for output in stage.outputs
+    }
+    dependencies = {
+        stage.name: {
+            producers[Path(path)] for path in stage.inputs if Path(path) in producers
+        }
+        for stage in stages
+    }
+
+    status = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while len(status) < len(stages):
+            progress = False
+            for stage in stages:
+                if stage.name in status or stage.name in running.values():
+                    continue
+                upstream = [status.get(name) for name in dependencies[stage.name]]
+                if any(s in ("failed", "blocked") for s in upstream):
+                    status[stage.name] = "blocked"
+                    progress = True
+                elif all(s in ("done", "skipped") for s in upstream):
+                    future = pool.submit(
+                        run_stage, stage, state.get(stage.name), force=force
+                    )
+                    running[future] = stage.name
+                    progress = True
+            if not running:
+                if not progress:
+                    raise ValueError("Pipeline stages have cyclic dependencies")
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    status[name], state[name] = future.result()
+                except RuntimeError as e:
+                    print(e)
+                    status[name] = "failed"
+                save_state(state, state_file)
+
+    for name, s in status.items():
+        print(f"{name}: {s}")
+    failed = [name for name, s in status.items() if s in ("failed", "blocked")]
+    if failed:
+        raise RuntimeError(f"Pipeline stages not completed: {failed}")
+    return status
@@ -0,0 +1,167 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrat_demand_model.config import data_dir
+from instrat_demand_model.results import UNITS, strip_pathway_suffix
+from instrat_demand_model.store import PARTITION_KEYS, TOTAL, read_demand_dataset
+
+HOURS = 8760
+
+# Carriers of the model output that get hourly profiles
+PROFILE_CARRIERS = ["Electricity", "Heat - space", "Heat - water", "Hydrogen"]
+
+# Sector of the profiles used for sectors without a profile of their own
+ALL_SECTORS = "All"
+
+# MWh per PJ
+MWH_PER_PJ = 1e6 / UNITS["TWh"]
+
+
+def hourly_dataset_dir(*path):
+    return data_dir("clean", "hourly_demand", *path)
+
+
+def normalize_profiles(df):
+    # df: (sector, carrier) rows x HOURS columns, scaled so that every row sums
+    # to one
+    if df.shape[1] != HOURS:
+        raise ValueError(f"Profiles have {df.shape[1]} hours, expected {HOURS}")
+    values = df.to_numpy(dtype=float)
+    totals = values.sum(axis=1)
+    invalid = (values < 0).any(axis=1) | ~(totals > 0)
+    if invalid.any():
+        raise ValueError(f"Invalid profiles: {df.index[invalid].tolist()}")
+    return pd.DataFrame(values / totals[:, None], index=df.index, columns=df.columns)
+
+
+def read_profiles(file):
+    # CSV with columns sector, carrier, hour (0 to 8759) and value
+    df = pd.read_csv(file)
+    df = df.pivot(index=["sector", "carrier"], columns="hour", values="value")
+    df = df.reindex(columns=range(HOURS))
+    missing = df.index[df.isna().any(axis=1)]
+    if len(missing) > 0:
+        raise ValueError(f"Missing hours in {file} for: {missing.tolist()}")
+    return normalize_profiles(df)
+
+
+def synthetic_profiles():
+    # Stylized shapes (winter peaking heating, daytime peaking electricity,
+    # lower industrial load on weekends, night charging of vehicles, flat
+    # hydrogen use) for when no measured profiles are given
+    hour = np.arange(HOURS)
+    day = hour // 24
+    # 1 in mid-January, 0 in mid-July
+    winter = (1 + np.cos(2 * np.pi * (day - 15) / 365)) / 2
+    # 0 at 2:00, 1 at 14:00
+    daytime = (1 - np.cos(2 * np.pi * (hour % 24 - 2) / 24)) / 2
+    weekday = day % 7 < 5
+
+    shapes = {
+        (ALL_SECTORS, "Electricity"): (1 + 0.2 * winter) * (0.7 + 0.3 * daytime),
+        (ALL_SECTORS, "Heat - space"): winter**2 * (0.8 + 0.2 * daytime),
+        (ALL_SECTORS, "Heat - water"): 0.6 + 0.4 * daytime,
+        (ALL_SECTORS, "Hydrogen"): np.ones(HOURS),
+        ("Industry", "Electricity"): np.where(weekday, 1.0, 0.7)
+        * (0.85 + 0.15 * daytime),
+        ("Industry", "Heat - space"): 0.6 + 0.4 * winter,
+        ("Transport", "Electricity"): 0.4 + 0.6 * (1 - daytime),
+    }
+    df = pd.DataFrame(
+        np.array(list(shapes.values())),
+        index=pd.MultiIndex.from_tuples(shapes.keys(), names=["sector", "carrier"]),
+        columns=range(HOURS),
+    )
+    return normalize_profiles(df)
+
+
+def match_profiles(profiles, index):
+    # Profile of every (sector, carrier) in index, falling back to the profile
+    # of the carrier for all sectors
+    positions = profiles.index.get_indexer(index)
+    fallback = profiles.index.get_indexer(
+        [(ALL_SECTORS, carrier) for _, carrier in index]
+    )
+    positions = np.where(positions >= 0, positions, fallback)
+    if (positions < 0).any():
+        raise ValueError(f"No profiles for: {index[positions < 0].tolist()}")
+    return profiles.to_numpy()[positions]
+
+
+def annual_demand(df):
+    # Rows of the demand dataset for one geo and scenario -> annual demand in
+    # MWh per (sector, carrier) of PROFILE_CARRIERS, with a column per year
+    df = df[(df["sector"] != TOTAL) & (df["unit"] == "PJ")]
+    df = df.drop(columns=[key for key in PARTITION_KEYS if key != "sector"])
+    df = df.assign(carrier=df.pop("Carrier").map(strip_pathway_suffix))
+    df = df[df["carrier"].isin(PROFILE_CARRIERS)]
+    df = df.groupby(["sector", "carrier"], observed=True).sum()
+    df.columns = df.columns.astype(int)
+    return df * MWH_PER_PJ
+
+
+def write_hourly_demand(df_annual, profiles, file):
+    # Stream the hourly demand (annual demand times the normalized profile) to
+    # a Parquet file with one row group per year, so that only one year is
+    # held in memory. Returns the number of rows written.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    shapes = match_profiles(profiles, df_annual.index)
+    n_series = len(df_annual)
+    sectors, carriers = df_annual.index.levels
+    columns = {
+        "sector": pa.DictionaryArray.from_arrays(
+            np.repeat(df_annual.index.codes[0], HOURS).astype(np.int32),
+            pa.array(sectors.astype(str)),
+        ),
+        "carrier": pa.DictionaryArray.from_arrays(
+            np.repeat(df_annual.index.codes[1], HOURS).astype(np.int32),
+            pa.array(carriers.astype(str)),
+        ),
+        "hour": pa.array(np.tile(np.arange(HOURS, dtype=np.int16), n_series)),
+    }
+    schema = pa.schema(
+        [
+            ("sector", columns["sector"].type),
+            ("carrier", columns["carrier"].type),
+            ("year", pa.int16()),
+            ("hour", pa.int16()),
+            ("demand_MWh", pa.float64()),
+        ]
+    )
+
+    os.makedirs(file.parent, exist_ok=True)
+    tmp_file = file.with_suffix(".tmp")
+    with pq.ParquetWriter(tmp_file, schema) as writer:
+        for year, annual in df_annual.items():
+            values = annual.to_numpy()[:, None] * shapes
+            writer.write_table(
+                pa.table(
+                    {
+                        **columns,
+                        "year": np.full(n_series * HOURS, year, dtype=np.int16),
+                        "demand_MWh": values.ravel(),
+                    },
+                    schema=schema,
+                )
+            )
+    os.replace(tmp_file, file)
+    return n_series * HOURS * df_annual.shape[1]
+
+
+def create_hourly_demand(profiles, root=None, savedir=None, geo=None, scenario=None):
+    # Hourly demand for every geo and scenario of the demand dataset, written
+    # as savedir/geo=.../scenario=.../part-0.parquet. Returns the files written.
+    if savedir is None:
+        savedir = hourly_dataset_dir()
+
+    df = read_demand_dataset(root, geo=geo, scenario=scenario, unit="PJ")
+    files = []
+    for (geo, scenario), df_cell in df.groupby(["geo", "scenario"], observed=True):
+        file = savedir.joinpath(f"geo={geo}", f"scenario={scenario}", "part-0.parquet")
+        write_hourly_demand(annual_demand(df_cell), profiles, file)
+        files.append(file)
+    return files
@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+
+import pandas as pd
+
+from instrat_demand_model.config import data_dir
+from instrat_demand_model.io import dict_to_str
+
+UNITS = {"PJ": 1.0, "TWh": 3.6}
+
+
+def strip_pathway_suffix(carrier):
+    return carrier.replace(" - electrifiable", "").replace(" - hydrogenizable", "")
+
+
+@dataclass
+class DemandTimeseries:
+    scenario: str
+    # Demand per sector with only the carriers that are used at some point
+    sectors: dict
+    # Demand summed over sectors and substitution pools, per unit
+    aggregates: dict
+    # Eurostat country code
+    geo: str = "PL"
+
+
+def aggregate_demand_timeseries(sectors):
+    df = pd.concat(sectors.values())
+    df = df.rename(index=strip_pathway_suffix)
+    return df.groupby(df.index).sum()
+
+
+def create_demand_result(dfs, scenario="baseline", geo="PL"):
+    # dfs: dict of sector -> output of create_sectoral_demand_timeseries
+    sectors = {sector: df[(df > 0).any(axis=1)] for sector, df in dfs.items()}
+    df = aggregate_demand_timeseries(sectors)
+    return DemandTimeseries(
+        scenario=scenario,
+        sectors=sectors,
+        aggregates={unit: df / factor for unit, factor in UNITS.items()},
+        geo=geo,
+    )
+
+
+def save_demand_timeseries(result, sectors=True, aggregates=True, savedir=None):
+    if savedir is None:
+        savedir = data_dir("clean")
+
+    if sectors:
+        for sector, df in result.sectors.items():
+            name = dict_to_str(
+                {"geo": result.geo, "scenario": result.scenario, "sector": sector}
+            )
+            df.round(3).to_csv(savedir.joinpath(f"demand_timeseries;{name}.csv"))
+
+    if aggregates:
+        for unit, df in result.aggregates.items():
+            name = dict_to_str(
+                {"geo": result.geo, "scenario": result.scenario, "unit": unit}
+            )
+            df.round(1).to_csv(savedir.joinpath(f"demand_timeseries;{name}.csv"))
@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from instrat_demand_model.config import data_dir
+
+# Parameters given per scenario, sector and period in rates.csv. The space heat
+# rates apply to "Heat - space" in Buildings, demand_change_rates of Buildings
+# to its other carriers.
+RATE_PARAMETERS = [
+    "demand_change_rates",
+    "space_heat_change_rates",
+    "elec_rates",
+    "hydro_rates",
+]
+
+# Parameters given per scenario and sector in sector_parameters.csv
+SECTOR_PARAMETERS = ["target_elec", "target_hydro", "elec_conv", "hydro_conv"]
+
+
+def scenarios_dir(*path):
+    return data_dir("raw", "scenarios", *path)
+
+
+@dataclass
+class ScenarioRegistry:
+    scenarios: pd.Index
+    sectors: pd.Index
+    periods: np.ndarray
+    # Arrays with a leading scenario axis followed by the axes listed in
+    # ensemble.ENSEMBLE_PARAMETERS, with sectors in the order of self.sectors
+    params: dict
+
+    def select(self, scenarios):
+        positions = self.scenarios.get_indexer(scenarios)
+        if (positions < 0).any():
+            unknown = set(scenarios) - set(self.scenarios)
+            raise KeyError(f"Unknown scenarios: {unknown}")
+        return ScenarioRegistry(
+            scenarios=self.scenarios[positions],
+            sectors=self.sectors,
+            periods=self.periods,
+            params={name: values[positions] for name, values in self.params.items()},
+        )
+
+    def ensemble_parameters(self, sectors):
+        # Arrays for run_ensemble, with the sector axes in the order of sectors
+        # (the columns of the baseline demand)
+        positions = self.sectors.get_indexer(sectors)
+        if (positions < 0).any():
+            unknown = set(sectors) - set(self.sectors)
+            raise KeyError(f"No scenario parameters for sectors: {unknown}")
+        return {
+            name: values if name == "space_heat_change_rates" else values[:, positions]
+            for name, values in self.params.items()
+        }
+
+    def parameters(self, scenario):
+        # Keyword arguments of create_sectoral_demand_timeseries, with the rates
+        # of every sector as a Series over periods viewing the compiled arrays
+        i = self.scenarios.get_loc(scenario)
+
+        def rates(name, j):
+            return pd.Series(self.params[name][i, j], index=self.periods)
+
+        params = {
+            name: {sector: rates(name, j) for j, sector in enumerate(self.sectors)}
+            for name in ["demand_change_rates", "elec_rates", "hydro_rates"]
+        }
+        if "Buildings" in self.sectors:
+            params["demand_change_rates"]["Buildings"] = {
+                "Other": params["demand_change_rates"]["Buildings"],
+                "Heat - space": pd.Series(
+                    self.params["space_heat_change_rates"][i], index=self.periods
+                ),
+            }
+        for name in SECTOR_PARAMETERS:
+            params[name] = {
+                sector: self.params[name][i, j] for j, sector in enumerate(self.sectors)
+            }
+        return params
+
+
+def _check_unique(df, keys, file):
+    duplicated = df[df.duplicated(keys, keep=False)]
+    if len(duplicated) > 0:
+        raise ValueError(
+            f"Duplicated rows in {file}: {duplicated[keys].drop_duplicates().values.tolist()}"
+        )
+
+
+def _dense(df, index, file):
+    # Reindex a frame to the product index, failing on missing combinations
+    dense = df.reindex(index)
+    missing = dense.index[dense.isna().any(axis=1)]
+    if len(missing) > 0:
+        raise ValueError(f"Missing values in {file} for: {missing.tolist()}")
+    return dense.to_numpy(dtype=float)
+
+
+def load_scenarios(rates_file=None, sector_parameters_file=None):
+    # Read, validate and compile the scenario tables into dense arrays
+    if rates_file is None:
+        rates_file = scenarios_dir("rates.csv")
+    if sector_parameters_file is None:
+        sector_parameters_file = scenarios_dir("sector_parameters.csv")
+
+    df_sectors = pd.read_csv(sector_parameters_file)
+    df_rates = pd.read_csv(rates_file)
+
+    unknown = set(df_sectors.columns) - {"scenario", "sector"} - set(SECTOR_PARAMETERS)
+    missing = set(SECTOR_PARAMETERS) - set(df_sectors.columns)
+    if unknown or missing:
+        raise ValueError(
+            f"Invalid columns in {sector_parameters_file}: "
+            f"unknown {unknown}, missing {missing}"
+        )
+    unknown = set(df_rates["parameter"]) - set(RATE_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown parameters in {rates_file}: {unknown}")
+    _check_unique(df_sectors, ["scenario", "sector"], sector_parameters_file)
+    _check_unique(df_rates, ["scenario", "parameter", "sector"], rates_file)
+
+    scenarios = pd.Index(df_sectors["scenario"].unique(), name="scenario")
+    sectors = pd.Index(df_sectors["sector"].unique(), name="sector")
+    periods_columns = [col for col in df_rates.columns if col.isdigit()]
+    periods = np.array(sorted(int(col) for col in periods_columns))
+    df_rates = df_rates.rename(columns={col: int(col) for col in periods_columns})
+
+    params = {}
+    index = pd.MultiIndex.from_product([scenarios, sectors])
+    values = _dense(
+        df_sectors.set_index(["scenario", "sector"]), index, sector_parameters_file
+    )
+    for k, name in enumerate(df_sectors.columns.drop(["scenario", "sector"])):
+        params[name] = values[:, k].reshape(len(scenarios), len(sectors))
+
+    df_rates = df_rates.set_index(["scenario", "parameter", "sector"])[periods]
+    for name in ["demand_change_rates", "elec_rates", "hydro_rates"]:
+        index = pd.MultiIndex.from_product([scenarios, [name], sectors])
+        params[name] = _dense(df_rates, index, rates_file).reshape(
+            len(scenarios), len(sectors), len(periods)
+        )
+    if "Buildings" in sectors:
+        index = pd.MultiIndex.from_product(
+            [scenarios, ["space_heat_change_rates"], ["Buildings"]]
+        )
+        params["space_heat_change_rates"] = _dense(df_rates, index, rates_file)
+    else:
+        params["space_heat_change_rates"] = np.zeros((len(scenarios), len(periods)))
+
+    return ScenarioRegistry(
+        scenarios=scenarios, sectors=sectors, periods=periods, params=params
+    )
@@ -0,0 +1,95 @@
+import pandas as pd
+
+from instrat_demand_model.config import data_dir
+from instrat_demand_model.io import dict_to_str
+
+PARTITION_KEYS = ["geo", "scenario", "sector", "unit"]
+
+# Sector key of the aggregates summed over all sectors
+TOTAL = "Total"
+
+
+def demand_dataset_dir(*path):
+    return data_dir("clean", "demand_timeseries", *path)
+
+
+def result_to_table(result):
+    # One row per (sector, unit, carrier) with a float64 column per year
+    dfs = [
+        df.assign(sector=sector, unit="PJ") for sector, df in result.sectors.items()
+    ] + [df.assign(sector=TOTAL, unit=unit) for unit, df in result.aggregates.items()]
+    df = pd.concat(dfs).rename_axis("Carrier").reset_index()
+    df = df.assign(geo=result.geo, scenario=result.scenario)
+    df.columns = df.columns.astype(str)
+
+    years = [col for col in df.columns if col not in PARTITION_KEYS + ["Carrier"]]
+    return df[PARTITION_KEYS + ["Carrier"] + years].astype(
+        {year: "float64" for year in years}
+    )
+
+
+def write_demand_dataset(results, root=None):
+    # Write results to a Parquet dataset partitioned as
+    # geo=.../scenario=.../sector=.../unit=..., replacing the partitions being written
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if root is None:
+        root = demand_dataset_dir()
+
+    df = pd.concat([result_to_table(result) for result in results])
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITION_KEYS,
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+
+
+def read_demand_dataset(
+    root=None, geo=None, scenario=None, sector=None, unit=None, columns=None
+):
+    # Partition keys accept a single value or a list of values and prune the
+    # files read; columns selects the year (or other) columns to load
+    import pyarrow.dataset as ds
+
+    if root is None:
+        root = demand_dataset_dir()
+
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+
+    condition = None
+    for key, values in zip(PARTITION_KEYS, [geo, scenario, sector, unit]):
+        if values is None:
+            continue
+        if isinstance(values, str):
+            values = [values]
+        expression = ds.field(key).isin(list(values))
+        condition = expression if condition is None else condition & expression
+
+    if columns is not None:
+        columns = PARTITION_KEYS + ["Carrier"] + [str(col) for col in columns]
+
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def export_demand_csv(root=None, savedir=None, **partitions):
+    # Compatibility view: write the dataset as the demand_timeseries;key=value
+    # CSV files, with per-sector files in PJ and aggregates in every unit
+    if savedir is None:
+        savedir = data_dir("clean")
+
+    df = read_demand_dataset(root, **partitions)
+    for (geo, scenario, sector, unit), subdf in df.groupby(PARTITION_KEYS):
+        subdf = subdf.drop(columns=PARTITION_KEYS).set_index("Carrier")
+        if sector == TOTAL:
+            name = dict_to_str({"geo": geo, "scenario": scenario, "unit": unit})
+            subdf = subdf.round(1)
+        else:
+            name = dict_to_str({"geo": geo, "scenario": scenario, "sector": sector})
+            subdf = subdf.round(3)
+        subdf.to_csv(savedir.joinpath(f"demand_timeseries;{name}.csv"))
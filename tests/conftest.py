@@ -0,0 +1,84 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+import pandas as pd
+import pytest
+
+from instrat_demand_model.config import data_dir
+from instrat_demand_model.instrat_demand_model import preprocess_baseline_demand
+from instrat_demand_model.scenarios import load_scenarios
+
+
+@pytest.fixture(scope="session")
+def df_baseline():
+    # Committed Polish baseline demand, preprocessed as in create_demand_timeseries
+    df = pd.read_csv(
+        data_dir("clean", "baseline_demand_2019-2021.csv"), keep_default_na=False
+    )
+    return preprocess_baseline_demand(df[df["geo"] == "PL"].drop(columns="geo"))
+
+
+@pytest.fixture(scope="session")
+def registry():
+    return load_scenarios()
+
+
+CONTENT = bytes(range(256)) * 1024
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Serves server.content with server.etag, honouring If-None-Match, Range
+    # and If-Range like a static file server
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        content, etag = server.content, server.etag
+
+        if self.path in server.missing:
+            self.send_error(404)
+            return
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range", etag) == etag:
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.content = CONTENT
+    server.etag = '"v1"'
+    server.requests = []
+    # Paths answered with 404
+    server.missing = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/data.bin"
+    yield server
+    server.shutdown()
+    server.server_close()
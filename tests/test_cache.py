@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from instrat_demand_model.cache import cell_key
+from instrat_demand_model.conversion import Pathway
+
+
+def test_cell_key_normalizes_numbers(df_baseline, registry):
+    params = registry.parameters("baseline")
+    key = cell_key("Industry", df_baseline, params)
+
+    same = dict(params)
+    same["hydro_conv"] = {
+        sector: int(value) for sector, value in params["hydro_conv"].items()
+    }
+    same["target_elec"] = {
+        sector: np.float32(value) if value == 0.5 else value
+        for sector, value in params["target_elec"].items()
+    }
+    same["elec_rates"] = {
+        sector: {np.int64(year): rate for year, rate in rates.items()}
+        for sector, rates in params["elec_rates"].items()
+    }
+    assert cell_key("Industry", df_baseline, same) == key
+    assert cell_key("Industry", df_baseline, same, np.int64(2020)) == key
+
+    changed = dict(params, hydro_conv=dict(params["hydro_conv"], Industry=0.5))
+    assert cell_key("Industry", df_baseline, changed) != key
+
+
+def test_cell_key_pathways(df_baseline, registry):
+    params = registry.parameters("baseline")
+
+    def pathways(efficiency, rates):
+        return {
+            "Industry": [
+                Pathway("Natural gas", "Hydrogen", rates=rates, efficiency=efficiency)
+            ]
+        }
+
+    key = cell_key(
+        "Industry", df_baseline, dict(params, pathways=pathways(1, {2020: 0}))
+    )
+    assert key == cell_key(
+        "Industry",
+        df_baseline,
+        dict(params, pathways=pathways(1.0, pd.Series([0.0], index=[2020]))),
+    )
+
+
+def test_cell_key_pathways_of_other_sectors(df_baseline, registry):
+    params = registry.parameters("baseline")
+    pathways = {
+        "Industry": [
+            Pathway("Natural gas - electrifiable", "District heat", {2020: 0.01}, 0.9)
+        ]
+    }
+    with_pathways = dict(params, pathways=pathways)
+
+    # Sectors without additional pathways get the key of an empty list
+    assert cell_key("Buildings", df_baseline, with_pathways) == cell_key(
+        "Buildings", df_baseline, dict(params, pathways={})
+    )
+    assert cell_key("Industry", df_baseline, with_pathways) != cell_key(
+        "Industry", df_baseline, dict(params, pathways={})
+    )
@@ -0,0 +1,69 @@
+import pytest
+
+from instrat_demand_model import download as download_module
+from instrat_demand_model.download import _update_metadata, download
+
+from tests.conftest import CONTENT
+
+
+@pytest.fixture(autouse=True)
+def metadata(tmp_path, monkeypatch):
+    file = tmp_path.joinpath("cache", "downloads.json")
+    monkeypatch.setattr(download_module, "metadata_file", lambda: file)
+    return file
+
+
+def write_part_file(savedir, content, etag):
+    part_file = savedir.joinpath("data.bin.part")
+    part_file.write_bytes(content)
+    _update_metadata(
+        str(savedir.joinpath("data.bin").resolve()) + ".part", {"etag": etag}
+    )
+    return part_file
+
+
+def test_download(server, tmp_path):
+    assert download(server.url, tmp_path, "data.bin")
+    assert tmp_path.joinpath("data.bin").read_bytes() == CONTENT
+    assert not tmp_path.joinpath("data.bin.part").exists()
+
+
+def test_conditional_refetch(server, tmp_path):
+    download(server.url, tmp_path, "data.bin")
+    assert not download(server.url, tmp_path, "data.bin")
+    assert server.requests[-1]["If-None-Match"] == '"v1"'
+    assert tmp_path.joinpath("data.bin").read_bytes() == CONTENT
+
+    # A new version on the server is fetched again
+    server.content = CONTENT[::-1]
+    server.etag = '"v2"'
+    assert download(server.url, tmp_path, "data.bin")
+    assert tmp_path.joinpath("data.bin").read_bytes() == CONTENT[::-1]
+
+
+def test_resume(server, tmp_path):
+    write_part_file(tmp_path, CONTENT[:1000], '"v1"')
+    progress = []
+    assert download(server.url, tmp_path, "data.bin", progress=progress.append)
+    assert server.requests[-1]["Range"] == "bytes=1000-"
+    assert server.requests[-1]["If-Range"] == '"v1"'
+    assert sum(progress) == len(CONTENT) - 1000
+    assert tmp_path.joinpath("data.bin").read_bytes() == CONTENT
+
+
+def test_restart_on_changed_etag(server, tmp_path):
+    # The server ignores the Range of an outdated part file and sends it all
+    write_part_file(tmp_path, b"outdated" * 100, '"v0"')
+    assert download(server.url, tmp_path, "data.bin")
+    assert server.requests[-1]["If-Range"] == '"v0"'
+    assert tmp_path.joinpath("data.bin").read_bytes() == CONTENT
+
+
+def test_restart_on_416(server, tmp_path):
+    write_part_file(tmp_path, CONTENT + b"extra", '"v1"')
+    assert download(server.url, tmp_path, "data.bin")
+    assert [request.get("Range") for request in server.requests] == [
+        f"bytes={len(CONTENT) + 5}-",
+        None,
+    ]
+    assert tmp_path.joinpath("data.bin").read_bytes() == CONTENT
@@ -0,0 +1,53 @@
+import pytest
+
+from instrat_demand_model import download as download_module
+from instrat_demand_model import download_manager
+from instrat_demand_model.download_manager import Download, download_all
+
+from tests.conftest import CONTENT
+
+
+@pytest.fixture(autouse=True)
+def data(tmp_path, monkeypatch):
+    # Keep downloads and their metadata out of the repository
+    monkeypatch.setattr(
+        download_manager, "data_dir", lambda *path: tmp_path.joinpath(*path)
+    )
+    monkeypatch.setattr(
+        download_module,
+        "metadata_file",
+        lambda: tmp_path.joinpath("cache", "downloads.json"),
+    )
+    return tmp_path
+
+
+def test_download_all(server, data):
+    root = server.url.rsplit("/", 1)[0]
+    downloads = [
+        Download(f"{root}/a.csv", "eurostat", "data.csv"),
+        Download(f"{root}/b.csv", "other", "data.csv"),
+    ]
+    status = download_all(downloads, max_workers=2, retries=0)
+    assert status == {
+        ("eurostat", "data.csv"): "downloaded",
+        ("other", "data.csv"): "downloaded",
+    }
+    for directory in ["eurostat", "other"]:
+        assert data.joinpath("raw", directory, "data.csv").read_bytes() == CONTENT
+
+    status = download_all(downloads, max_workers=2, retries=0)
+    assert set(status.values()) == {"up to date"}
+
+
+def test_download_all_reports_every_failure(server, data):
+    # The failing download shares its filename with a successful one
+    root = server.url.rsplit("/", 1)[0]
+    server.missing.add("/missing.csv")
+    downloads = [
+        Download(f"{root}/missing.csv", "eurostat", "data.csv"),
+        Download(f"{root}/b.csv", "other", "data.csv"),
+    ]
+    with pytest.raises(RuntimeError, match="eurostat/data.csv"):
+        download_all(downloads, max_workers=2, retries=0)
+    assert data.joinpath("raw", "other", "data.csv").read_bytes() == CONTENT
+    assert not data.joinpath("raw", "eurostat", "data.csv").exists()
@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+
+from instrat_demand_model.eurostat import ingest_nrg_bal, read_nrg_bal
+
+
+def write_raw_file(file):
+    pd.DataFrame(
+        [
+            dict(
+                nrg_bal=nrg_bal,
+                siec="E7000",
+                unit="TJ",
+                geo=geo,
+                TIME_PERIOD=year,
+                OBS_VALUE=1.0,
+            )
+            for nrg_bal in ["GAE", "FC_IND_E"]
+            for geo in ["PL", "DE"]
+            for year in [2019, 2020]
+        ]
+    ).to_csv(file, index=False)
+
+
+def test_ingest_filters(tmp_path):
+    raw_file = tmp_path.joinpath("nrg_bal_c.csv")
+    cache_file = tmp_path.joinpath("nrg_bal_c.parquet")
+    write_raw_file(raw_file)
+
+    ingest_nrg_bal(raw_file, cache_file, geo=["PL"], years=[2020], nrg_bal=["GAE"])
+    df = read_nrg_bal(cache_file)
+    assert len(df) == 1
+    assert df[["geo", "TIME_PERIOD", "nrg_bal"]].values.tolist() == [
+        ["PL", 2020, "GAE"]
+    ]
+
+
+def test_ingest_reuses_cache(tmp_path):
+    raw_file = tmp_path.joinpath("nrg_bal_c.csv")
+    cache_file = tmp_path.joinpath("nrg_bal_c.parquet")
+    write_raw_file(raw_file)
+
+    assert ingest_nrg_bal(raw_file, cache_file, geo=["PL"], years=[2019, 2020])
+    # Same filters in another order
+    assert not ingest_nrg_bal(raw_file, cache_file, geo=["PL"], years=[2020, 2019])
+    # Other filters
+    assert ingest_nrg_bal(raw_file, cache_file, geo=["PL", "DE"], years=[2019, 2020])
+    assert len(read_nrg_bal(cache_file)) == 8
+    # Raw file newer than the cache
+    mtime = cache_file.stat().st_mtime
+    os.utime(raw_file, (mtime + 10, mtime + 10))
+    assert ingest_nrg_bal(raw_file, cache_file, geo=["PL", "DE"], years=[2019, 2020])
+    assert ingest_nrg_bal(
+        raw_file, cache_file, geo=["PL", "DE"], years=[2019, 2020], force=True
+    )
@@ -0,0 +1,180 @@
+import re
+import time
+
+import pandas as pd
+
+from instrat_demand_model.gsheets import (
+    RateLimiter,
+    a1_range,
+    cell_diff,
+    frame_to_rows,
+    sync_gsheets,
+)
+
+
+class MemoryWorksheet:
+    # In-process stand-in for gspread.Worksheet, counting API requests
+    def __init__(self, title, values=None, rows=1000, cols=26):
+        self.title = title
+        self.values = [list(row) for row in values or []]
+        self.row_count = max(rows, len(self.values))
+        self.col_count = max([cols] + [len(row) for row in self.values])
+        self.requests = 0
+
+    def get_all_values(self, **kwargs):
+        self.requests += 1
+        n_cols = max([len(row) for row in self.values], default=0)
+        return [row + [""] * (n_cols - len(row)) for row in self.values]
+
+    def get_all_records(self, **kwargs):
+        self.requests += 1
+        if not self.values:
+            return []
+        header, *rows = self.values
+        return [dict(zip(header, row)) for row in rows]
+
+    def resize(self, rows=None, cols=None):
+        self.requests += 1
+        self.row_count = rows if rows is not None else self.row_count
+        self.col_count = cols if cols is not None else self.col_count
+
+    def batch_update(self, data, **kwargs):
+        self.requests += 1
+        for update in data:
+            start = update["range"].split(":")[0]
+            letters, digits = re.fullmatch(r"([A-Z]+)(\d+)", start).groups()
+            col = 0
+            for letter in letters:
+                col = col * 26 + ord(letter) - ord("A") + 1
+            row, col = int(digits) - 1, col - 1
+            for i, values in enumerate(update["values"]):
+                for j, value in enumerate(values):
+                    if row + i >= self.row_count or col + j >= self.col_count:
+                        raise ValueError(f"Range {update['range']} exceeds grid")
+                    while len(self.values) <= row + i:
+                        self.values.append([])
+                    line = self.values[row + i]
+                    line.extend([""] * (col + j + 1 - len(line)))
+                    line[col + j] = value
+
+
+class MemorySpreadsheet:
+    def __init__(self, worksheets):
+        self._worksheets = {ws.title: ws for ws in worksheets}
+
+    def worksheets(self):
+        return list(self._worksheets.values())
+
+    def worksheet(self, title):
+        return self._worksheets[title]
+
+
+class MemoryClient:
+    # In-process stand-in for gspread.Client: url -> MemorySpreadsheet
+    def __init__(self, spreadsheets=None):
+        self.spreadsheets = spreadsheets if spreadsheets is not None else {}
+
+    def open_by_url(self, url):
+        return self.spreadsheets[url]
+
+
+class CountingClient(MemoryClient):
+    def __init__(self, spreadsheets=None):
+        super().__init__(spreadsheets)
+        self.opened = 0
+
+    def open_by_url(self, url):
+        self.opened += 1
+        return super().open_by_url(url)
+
+
+class CountingLimiter(RateLimiter):
+    def __init__(self, per_minute=60_000):
+        super().__init__(per_minute)
+        self.calls = 0
+
+    def wait(self):
+        self.calls += 1
+        super().wait()
+
+
+def frame():
+    return pd.DataFrame({"Carrier": ["Electricity", "Hydrogen"], "2020": [1.5, 2.0]})
+
+
+def test_a1_range():
+    assert a1_range(0, 0, 1, 1) == "A1"
+    assert a1_range(1, 25, 2, 3) == "Z2:AB3"
+
+
+def test_cell_diff():
+    rows = frame_to_rows(frame())
+    assert cell_diff(rows, rows) == []
+
+    new = [row.copy() for row in rows]
+    new[1][1] = 3.0
+    new[2][1] = 4.0
+    assert cell_diff(rows, new) == [{"range": "B2:B3", "values": [[3.0], [4.0]]}]
+
+    # Cells outside the new contents are cleared
+    assert cell_diff(rows, rows[:2]) == [{"range": "A3:B3", "values": [["", ""]]}]
+
+
+def test_sync_no_op():
+    ws = MemoryWorksheet("demand", frame_to_rows(frame()))
+    client = MemoryClient({"url": MemorySpreadsheet([ws])})
+    assert sync_gsheets(
+        [(frame(), "url", "demand")], client=client, limiter=CountingLimiter()
+    ) == [0]
+    # Only the contents were read
+    assert ws.requests == 1
+
+
+def test_sync_changed_cells():
+    ws = MemoryWorksheet("demand", frame_to_rows(frame()))
+    client = MemoryClient({"url": MemorySpreadsheet([ws])})
+    df = frame()
+    df.loc[1, "2020"] = 2.5
+    assert sync_gsheets(
+        [(df, "url", "demand")], client=client, limiter=CountingLimiter()
+    ) == [1]
+    assert ws.requests == 2
+    assert ws.get_all_values() == frame_to_rows(df)
+
+
+def test_sync_resized_sheet():
+    ws = MemoryWorksheet("demand", rows=2, cols=1)
+    client = MemoryClient({"url": MemorySpreadsheet([ws])})
+    df = frame()
+    assert sync_gsheets(
+        [(df, "url", "demand")], client=client, limiter=CountingLimiter()
+    ) == [6]
+    assert (ws.row_count, ws.col_count) == (3, 2)
+    assert ws.get_all_values() == frame_to_rows(df)
+
+
+def test_sync_shared_client_and_limiter():
+    sheets = {
+        f"url{i}": MemorySpreadsheet(
+            [MemoryWorksheet("a"), MemoryWorksheet("b", frame_to_rows(frame()))]
+        )
+        for i in range(3)
+    }
+    client = CountingClient(sheets)
+    limiter = CountingLimiter()
+    uploads = [(frame(), url, name) for url in sheets for name in ["a", "b"]]
+    assert sync_gsheets(uploads, client=client, limiter=limiter) == [6, 0] * 3
+
+    worksheets = [ws for gs in sheets.values() for ws in gs.worksheets()]
+    assert client.opened == len(uploads)
+    # Every API call goes through the shared limiter: open_by_url, worksheet
+    # and the worksheet requests
+    assert limiter.calls == 2 * len(uploads) + sum(ws.requests for ws in worksheets)
+
+
+def test_rate_limiter_spacing():
+    limiter = RateLimiter(per_minute=60 / 0.02)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait()
+    assert time.monotonic() - start >= 4 * 0.02 * 0.9
@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from instrat_demand_model.conversion import Pathway
+from instrat_demand_model.instrat_demand_model import (
+    compile_sectoral_model,
+    create_conversion_matrix,
+    create_growth_vector,
+    create_sectoral_demand_timeseries,
+    initialize,
+)
+
+SCENARIOS = ["instrat_ambitious", "baseline", "slow_transformation"]
+SECTORS = ["Industry", "Buildings", "Transport", "Agriculture"]
+
+
+def reference_timeseries(
+    sector,
+    df_baseline,
+    demand_change_rates,
+    target_elec,
+    target_hydro,
+    elec_rates,
+    hydro_rates,
+    elec_conv,
+    hydro_conv,
+    initial_year=2020,
+    final_year=2050,
+    interpolation="step",
+):
+    # The original year by year loop over dense conversion matrices
+    df = initialize(
+        df_baseline[sector],
+        target_elec[sector],
+        target_hydro[sector],
+        initial_year=initial_year,
+    )
+    carriers = df.index
+
+    for year in range(initial_year, final_year):
+        growth_vector = create_growth_vector(
+            year, carriers, sector, demand_change_rates[sector], interpolation
+        )
+        conversion_matrix = create_conversion_matrix(
+            year,
+            carriers,
+            elec_rates[sector],
+            hydro_rates[sector],
+            elec_conv[sector],
+            hydro_conv[sector],
+            interpolation,
+        )
+        df[year + 1] = growth_vector * (conversion_matrix @ df[year])
+
+    return df
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+@pytest.mark.parametrize("sector", SECTORS)
+@pytest.mark.parametrize("method", ["stepwise", "period"])
+def test_compiled_model_matches_reference(
+    df_baseline, registry, scenario, sector, method
+):
+    params = registry.parameters(scenario)
+    expected = reference_timeseries(sector, df_baseline, **params)
+    result = create_sectoral_demand_timeseries(
+        sector, df_baseline, **params, method=method
+    )
+
+    assert result.index.tolist() == expected.index.tolist()
+    assert result.columns.tolist() == expected.columns.tolist()
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize("interpolation", ["linear", "scurve"])
+@pytest.mark.parametrize("sector", SECTORS)
+def test_interpolated_model_matches_reference(
+    df_baseline, registry, sector, interpolation
+):
+    params = registry.parameters("baseline")
+    expected = reference_timeseries(
+        sector, df_baseline, **params, final_year=2060, interpolation=interpolation
+    )
+    result = create_sectoral_demand_timeseries(
+        sector, df_baseline, **params, final_year=2060, interpolation=interpolation
+    )
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_buildings_space_heat_split(df_baseline, registry, scenario):
+    # Space heat follows its own change rates, the other carriers without
+    # substitution pathways follow demand_change_rates["Other"]
+    params = registry.parameters(scenario)
+    rates = params["demand_change_rates"]["Buildings"]
+    df = create_sectoral_demand_timeseries("Buildings", df_baseline, **params)
+
+    growth = df[2021] / df[2020]
+    np.testing.assert_allclose(growth["Heat - space"], 1 + rates["Heat - space"][2020])
+    np.testing.assert_allclose(growth["Heat - water"], 1 + rates["Other"][2020])
+    growth = df[2031] / df[2030]
+    np.testing.assert_allclose(growth["Heat - space"], 1 + rates["Heat - space"][2030])
+
+
+def pathway_reference(sector, df_baseline, params, pathways, final_year=2050):
+    # Dense year by year loop with the default conversion matrix extended by
+    # the additional pathways
+    df = initialize(
+        df_baseline[sector],
+        params["target_elec"][sector],
+        params["target_hydro"][sector],
+    )
+    targets = [p.target for p in pathways if p.target not in df.index]
+    df = df.reindex(df.index.append(pd.Index(targets).unique()), fill_value=0.0)
+    carriers = df.index
+
+    for year in range(2020, final_year):
+        m = create_conversion_matrix(
+            year,
+            carriers,
+            params["elec_rates"][sector],
+            params["hydro_rates"][sector],
+            params["elec_conv"][sector],
+            params["hydro_conv"][sector],
+        )
+        for p in pathways:
+            rate = p.rates[(year // 10) * 10]
+            m.loc[p.source, p.source] -= rate
+            m.loc[p.target, p.source] += p.efficiency * rate
+        g = create_growth_vector(
+            year, carriers, sector, params["demand_change_rates"][sector]
+        )
+        df[year + 1] = g * (m @ df[year])
+    return df
+
+
+def test_additional_pathway(df_baseline, registry):
+    params = registry.parameters("baseline")
+    source = "Natural gas - electrifiable"
+    pathway = Pathway(
+        source=source,
+        target="District heat",
+        rates={2020: 0.01, 2030: 0.02, 2040: 0.03},
+        efficiency=0.9,
+    )
+    pathways = {"Industry": [pathway]}
+
+    model = compile_sectoral_model("Industry", df_baseline, **params, pathways=pathways)
+    # The new target carrier starts from zero demand
+    assert model.carriers[-1] == "District heat"
+    assert model.x0[-1] == 0.0
+    # The source pool loses the sum of the rates of its edges
+    i = model.carriers.get_loc(source)
+    elec_rates = params["elec_rates"]["Industry"]
+    for t, p in enumerate(model.period_index):
+        period = (2020 + t) // 10 * 10
+        np.testing.assert_allclose(
+            model.conversion.diagonal[p, i],
+            1 - elec_rates[period] - pathway.rates[period],
+        )
+
+    expected = pathway_reference("Industry", df_baseline, params, [pathway])
+    result = create_sectoral_demand_timeseries(
+        "Industry", df_baseline, **params, pathways=pathways
+    )
+    assert result.index.tolist() == expected.index.tolist()
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-9)
+    assert result.loc["District heat", 2050] > 0
+
+
+def test_additional_pathways_of_other_sectors(df_baseline, registry):
+    params = registry.parameters("baseline")
+    pathways = {
+        "Industry": [
+            Pathway("Natural gas - electrifiable", "District heat", {2020: 0.01}, 0.9)
+        ]
+    }
+    for sector in df_baseline.columns:
+        result = create_sectoral_demand_timeseries(
+            sector, df_baseline, **params, pathways=pathways
+        )
+        assert ("District heat" in result.index) == (sector == "Industry")
+    np.testing.assert_allclose(
+        create_sectoral_demand_timeseries(
+            "Buildings", df_baseline, **params, pathways=pathways
+        ),
+        create_sectoral_demand_timeseries("Buildings", df_baseline, **params),
+    )
+
+
+def test_pathway_from_fossil_fuel_is_rejected(df_baseline, registry):
+    params = registry.parameters("baseline")
+    pathways = {"Industry": [Pathway("Natural gas", "District heat", {2020: 0.01}, 1)]}
+    with pytest.raises(ValueError, match="Natural gas"):
+        create_sectoral_demand_timeseries(
+            "Industry", df_baseline, **params, pathways=pathways
+        )
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from instrat_demand_model.ensemble import run_ensemble
+from instrat_demand_model.instrat_demand_model import (
+    create_sectoral_demand_timeseries,
+    interpolate_rates,
+    rate_segments,
+)
+
+
+def test_interpolation():
+    years = [2015, 2020, 2025, 2030, 2045]
+    np.testing.assert_allclose(
+        interpolate_rates([2020, 2030], [0.0, 1.0], years, "step"),
+        [0.0, 0.0, 0.0, 1.0, 1.0],
+    )
+    np.testing.assert_allclose(
+        interpolate_rates([2020, 2030], [0.0, 1.0], years, "linear"),
+        [0.0, 0.0, 0.5, 1.0, 1.0],
+    )
+    np.testing.assert_allclose(
+        interpolate_rates([2020, 2030], [0.0, 1.0], [2022, 2025], "scurve"),
+        [0.104, 0.5],
+    )
+
+
+@pytest.mark.parametrize("n_steps", [0, 1])
+def test_rate_segments_short(n_steps):
+    starts, period_index = rate_segments(np.ones((n_steps, 3)), np.ones(n_steps))
+    np.testing.assert_array_equal(starts, np.arange(n_steps))
+    np.testing.assert_array_equal(period_index, np.zeros(n_steps, dtype=int))
+
+
+def test_rate_segments():
+    starts, period_index = rate_segments(np.array([1.0, 1.0, 2.0, 2.0, 1.0]))
+    np.testing.assert_array_equal(starts, [0, 2, 4])
+    np.testing.assert_array_equal(period_index, [0, 0, 1, 1, 2])
+
+
+@pytest.mark.parametrize("final_year", [2020, 2021])
+@pytest.mark.parametrize("method", ["stepwise", "period"])
+def test_short_horizon(df_baseline, registry, final_year, method):
+    params = registry.parameters("baseline")
+    long = create_sectoral_demand_timeseries(
+        "Buildings", df_baseline, **params, final_year=2050
+    )
+    short = create_sectoral_demand_timeseries(
+        "Buildings", df_baseline, **params, final_year=final_year, method=method
+    )
+    assert short.columns.tolist() == list(range(2020, final_year + 1))
+    np.testing.assert_allclose(short, long.loc[:, :final_year])
+
+
+@pytest.mark.parametrize("final_year", [2020, 2021])
+def test_short_horizon_ensemble(df_baseline, registry, final_year):
+    result = run_ensemble(
+        df_baseline,
+        registry.ensemble_parameters(df_baseline.columns),
+        final_year=final_year,
+        breakpoints=registry.periods,
+    )
+    assert result.values.shape[-1] == final_year - 2020 + 1
+    np.testing.assert_allclose(
+        result.values[..., 0],
+        np.broadcast_to(result.values[:1, ..., 0], result.values[..., 0].shape),
+    )